@@ -1,7 +1,7 @@
 from django.contrib import admin
 
 from .models import (Cart, Favorite, IngredientDescription, IngredientQuantity,
-                     Recipe, Tag)
+                     Recipe, RecipePopularity, ShoppingListItem, Tag)
 
 
 @admin.register(Favorite)
@@ -47,3 +47,15 @@ class IngredientAdmin(admin.ModelAdmin):
 class CartAdmin(admin.ModelAdmin):
     list_display = ('pk', 'user',)
     empty_value_display = '-пусто-'
+
+
+@admin.register(ShoppingListItem)
+class ShoppingListItemAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'user', 'ingredient', 'amount',)
+    empty_value_display = '-пусто-'
+
+
+@admin.register(RecipePopularity)
+class RecipePopularityAdmin(admin.ModelAdmin):
+    list_display = ('recipe', 'score', 'computed_at',)
+    empty_value_display = '-пусто-'
@@ -0,0 +1,449 @@
+"""
+Benchmarks, they are not run by `python manage.py test`:
+
+    python manage.py test api.benchmarks
+    python manage.py test api.benchmarks.ShoppingListExportBenchmark
+
+Sizes are set by BENCHMARK_* environment variables (see classes).
+Memory is the peak of memory allocated by python (tracemalloc),
+so buffers of C libraries (Pillow image data) are not counted.
+"""
+import base64
+import csv
+import io
+import json
+import os
+import statistics
+import time
+import tempfile
+import tracemalloc
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import TestCase, override_settings
+from django.test.client import BOUNDARY, MULTIPART_CONTENT, encode_multipart
+from PIL import Image
+from rest_framework.request import Request
+from rest_framework.test import (APIClient, APIRequestFactory,
+                                 force_authenticate)
+
+from .filters import RecipeFilter
+from .models import (Cart, Favorite, IngredientDescription, Recipe,
+                     ShoppingListItem, Tag)
+from .shopping_list import csv_rows, pdf_file, text_rows
+from .views import RecipeViewSet
+
+User = get_user_model()
+
+
+def get_size(name: str, default: int) -> int:
+    return int(os.environ.get(f'BENCHMARK_{name}', default))
+
+
+def measure(function, *args):
+    """
+    :return: (result, peak of allocated memory in bytes, seconds)
+    """
+    tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        result = function(*args)
+        seconds = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return result, peak, seconds
+
+
+def report(title: str, rows):
+    """
+    print table of results
+    :param rows: [(name, value, ...), ...]
+    """
+    print(f'\n{title}')
+    for row in rows:
+        name, *values = row
+        values = ''.join(f'{value!s:>14}' for value in values)
+        print(f'    {name!s:<44}{values}')
+
+
+def megabytes(size: int) -> str:
+    return f'{size / 1024 / 1024:.2f} MB'
+
+
+def milliseconds(seconds: float) -> str:
+    return f'{seconds * 1000:.2f} ms'
+
+
+def percentile(values, percent: int) -> float:
+    return statistics.quantiles(values, n=100, method='inclusive')[
+        percent - 1
+    ]
+
+
+class ShoppingListExportBenchmark(TestCase):
+    """
+    peak memory of shopping list export: the whole csv in HttpResponse
+    (before streaming) against streamed csv and txt and pdf file.
+    BENCHMARK_SHOPPING_LIST_ROWS - number of rows in the list
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        rows = get_size('SHOPPING_LIST_ROWS', 20000)
+        cls.user = User.objects.create_user(
+            'buyer', 'buyer@example.com', 'password'
+        )
+        IngredientDescription.objects.bulk_create(
+            IngredientDescription(name=f'Ингредиент номер {i}',
+                                  measurement_unit='г')
+            for i in range(rows)
+        )
+        # sqlite doesn't return ids of bulk_create
+        ingredient_ids = IngredientDescription.objects.values_list(
+            'pk', flat=True
+        )
+        ShoppingListItem.objects.bulk_create(
+            ShoppingListItem(user=cls.user, ingredient_id=ingredient_id,
+                             amount=i + 1)
+            for i, ingredient_id in enumerate(ingredient_ids)
+        )
+
+    def get_ingredients(self):
+        return ShoppingListItem.objects.filter(user=self.user).values(
+            'ingredient__name', 'ingredient__measurement_unit', 'amount'
+        )
+
+    def export_in_memory(self):
+        response = HttpResponse(content_type='text/csv')
+        writer = csv.writer(response)
+        for ing in self.get_ingredients():
+            writer.writerow(
+                [str(ing['ingredient__name']),
+                 str(ing['amount']),
+                 str(ing['ingredient__measurement_unit'])]
+            )
+        return len(response.content)
+
+    def export_streaming(self, rows):
+        response = StreamingHttpResponse(
+            rows(self.get_ingredients().iterator(chunk_size=500))
+        )
+        return sum(len(chunk) for chunk in response)
+
+    def export_pdf(self):
+        file = pdf_file(self.get_ingredients().iterator(chunk_size=500))
+        with file:
+            return len(file.read())
+
+    def test_export(self):
+        results = [('', 'size', 'peak memory', 'seconds')]
+        for name, function, args in (
+            ('csv in memory', self.export_in_memory, ()),
+            ('csv streaming', self.export_streaming, (csv_rows,)),
+            ('txt streaming', self.export_streaming, (text_rows,)),
+            (f'pdf {settings.SHOPPING_LIST_PDF_MAX_ROWS} rows',
+             self.export_pdf, ()),
+        ):
+            size, peak, seconds = measure(function, *args)
+            self.assertGreater(size, 0)
+            results.append(
+                (name, megabytes(size), megabytes(peak), f'{seconds:.2f}')
+            )
+        report(
+            f'Shopping list of {self.get_ingredients().count()} rows',
+            results
+        )
+
+
+class IngredientAutocompleteBenchmark(TestCase):
+    """
+    latency per keystroke of ingredient search over data/dump_ingredients
+    .json: the whole list filtered by prefix against autocomplete.
+    Every BENCHMARK_AUTOCOMPLETE_STEP-th ingredient name is typed
+    letter by letter
+    """
+    fixture = os.path.join('data', 'dump_ingredients.json')
+    max_typed = 12
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command('loaddata', cls.fixture, verbosity=0)
+
+    def get_keystrokes(self):
+        step = get_size('AUTOCOMPLETE_STEP', 20)
+        names = IngredientDescription.objects.order_by('pk').values_list(
+            'name', flat=True
+        )[::step]
+        return [
+            name[:length]
+            for name in names
+            for length in range(1, min(len(name), self.max_typed) + 1)
+        ]
+
+    def type_names(self, url, keystrokes):
+        """
+        :return: ([seconds of every request], [number of ingredients])
+        """
+        client = APIClient()
+        client.get(url, {'name': keystrokes[0]})
+        timings = []
+        sizes = []
+        for name in keystrokes:
+            started = time.perf_counter()
+            response = client.get(url, {'name': name})
+            timings.append(time.perf_counter() - started)
+            self.assertEqual(response.status_code, 200)
+            sizes.append(len(response.json()))
+        return timings, sizes
+
+    def test_keystrokes(self):
+        keystrokes = self.get_keystrokes()
+        results = [('', 'p50', 'p99', 'max', 'rows avg', 'rows max')]
+        for url in ('/api/ingredients/', '/api/ingredients/autocomplete/'):
+            timings, sizes = self.type_names(url, keystrokes)
+            results.append((
+                url,
+                milliseconds(percentile(timings, 50)),
+                milliseconds(percentile(timings, 99)),
+                milliseconds(max(timings)),
+                f'{statistics.mean(sizes):.1f}',
+                max(sizes),
+            ))
+        report(
+            f'{len(keystrokes)} keystrokes, '
+            f'{IngredientDescription.objects.count()} ingredients, '
+            f'{connection.vendor}',
+            results
+        )
+
+
+def old_filter_is_favorited(queryset, user, value):
+    if value == 'true':
+        return Recipe.objects.filter(
+            favorites__recipe__in=queryset.values_list('pk', flat=True),
+            favorites__user=user
+        )
+    return Recipe.objects.exclude(
+        favorites__recipe__in=queryset.values_list('pk', flat=True),
+        favorites__user=user
+    )
+
+
+def old_filter_is_in_shopping_cart(queryset, user, value):
+    if value == 'true':
+        return queryset.filter(
+            in_cart__recipe__in=queryset.values_list('pk', flat=True),
+            in_cart__user=user
+        )
+    return queryset.exclude(
+        in_cart__recipe__in=queryset.values_list('pk', flat=True),
+        in_cart__user=user
+    )
+
+
+def old_recipe_filter(params: dict, user):
+    """
+    RecipeFilter before EXISTS predicates, filters go in the same order
+    """
+    queryset = Recipe.objects.all()
+    if 'is_favorited' in params:
+        queryset = old_filter_is_favorited(
+            queryset, user, params['is_favorited']
+        )
+    if 'tags' in params:
+        queryset = queryset.filter(tags__slug__in=params['tags']).distinct()
+    if 'is_in_shopping_cart' in params:
+        queryset = old_filter_is_in_shopping_cart(
+            queryset, user, params['is_in_shopping_cart']
+        )
+    return queryset
+
+
+class RecipeFilterBenchmark(TestCase):
+    """
+    query plans and time of favorite and cart filters of recipe list,
+    old IN subqueries against EXISTS predicates.
+    BENCHMARK_RECIPES - number of recipes, every 10th is in favorites
+    and every 7th in cart of the user, every recipe has 2 of 4 tags
+    """
+    cases = (
+        {'is_favorited': 'true'},
+        {'is_favorited': 'true', 'tags': ['tag_0', 'tag_1']},
+        {'is_in_shopping_cart': 'true', 'tags': ['tag_2']},
+        {'is_favorited': 'false', 'tags': ['tag_3']},
+        {'is_favorited': 'true', 'is_in_shopping_cart': 'true'},
+    )
+    repeat = 5
+    page_size = 6
+    batch_size = 5000
+
+    @classmethod
+    def setUpTestData(cls):
+        recipes = get_size('RECIPES', 100000)
+        cls.user = User.objects.create_user(
+            'cook', 'cook@example.com', 'password'
+        )
+        tags = [
+            Tag.objects.create(name=f'Тег {i}', color=f'#00000{i}',
+                               slug=f'tag_{i}')
+            for i in range(4)
+        ]
+        Recipe.objects.bulk_create(
+            (Recipe(author=cls.user, name=f'Рецепт {i}',
+                    image='recipes/images/benchmark.png', text='Описание',
+                    cooking_time=i % 120 + 1)
+             for i in range(recipes)),
+            batch_size=cls.batch_size
+        )
+        # sqlite doesn't return ids of bulk_create
+        recipe_ids = list(Recipe.objects.values_list('pk', flat=True))
+        Recipe.tags.through.objects.bulk_create(
+            (Recipe.tags.through(recipe_id=recipe_id, tag_id=tag.pk)
+             for i, recipe_id in enumerate(recipe_ids)
+             for tag in (tags[i % 4], tags[(i + 1) % 4])),
+            batch_size=cls.batch_size
+        )
+        Favorite.objects.bulk_create(
+            (Favorite(user=cls.user, recipe_id=recipe_id)
+             for recipe_id in recipe_ids[::10]),
+            batch_size=cls.batch_size
+        )
+        Cart.objects.bulk_create(
+            (Cart(user=cls.user, recipe_id=recipe_id)
+             for recipe_id in recipe_ids[::7]),
+            batch_size=cls.batch_size
+        )
+
+    def new_recipe_filter(self, params: dict):
+        request = Request(APIRequestFactory().get('/api/recipes/', params))
+        request.user = self.user
+        return RecipeFilter(
+            request.query_params, queryset=Recipe.objects.all(),
+            request=request
+        ).qs
+
+    def run_list(self, queryset):
+        """
+        queries of a list page: count and the first page
+        :return: (count, median seconds)
+        """
+        timings = []
+        for _ in range(self.repeat):
+            started = time.perf_counter()
+            count = queryset.count()
+            list(queryset.values_list('pk', flat=True)[:self.page_size])
+            timings.append(time.perf_counter() - started)
+        return count, statistics.median(timings)
+
+    def test_filters(self):
+        results = [('', 'old', 'new', 'old rows', 'new rows')]
+        plans = []
+        for params in self.cases:
+            old = old_recipe_filter(params, self.user)
+            new = self.new_recipe_filter(params)
+            old_count, old_seconds = self.run_list(old)
+            new_count, new_seconds = self.run_list(new)
+            name = '&'.join(
+                f'{key}={value}' for key, values in params.items()
+                for value in (values if isinstance(values, list)
+                              else [values])
+            )
+            results.append((
+                name, milliseconds(old_seconds),
+                milliseconds(new_seconds), old_count, new_count,
+            ))
+            plans.append((name, old.explain(), new.explain()))
+        report(
+            f'{Recipe.objects.count()} recipes, {connection.vendor}, '
+            f'median of {self.repeat} runs of count and first page',
+            results
+        )
+        for name, old_plan, new_plan in plans:
+            print(f'\n{name}\n  old:\n{old_plan}\n  new:\n{new_plan}')
+
+
+class RecipeImageUploadBenchmark(TestCase):
+    """
+    peak memory of recipe creation with image as base64 in json
+    against file in multipart/form-data. The image is png of random
+    pixels BENCHMARK_IMAGE_SIDE x BENCHMARK_IMAGE_SIDE (~10 MB for 1800),
+    requests are built before measuring
+    """
+    url = '/api/recipes/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            'uploader', 'uploader@example.com', 'password'
+        )
+        cls.tag = Tag.objects.create(name='Тег', color='#000000', slug='tag')
+        cls.ingredient = IngredientDescription.objects.create(
+            name='Ингредиент', measurement_unit='г'
+        )
+
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        media_settings = override_settings(MEDIA_ROOT=self.media.name)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+        self.addCleanup(self.media.cleanup)
+
+    def make_image(self) -> bytes:
+        """
+        every image is new, equal images are not written twice
+        """
+        side = get_size('IMAGE_SIDE', 1800)
+        image = Image.frombytes('RGB', (side, side), os.urandom(side ** 2 * 3))
+        buffer = io.BytesIO()
+        image.save(buffer, 'PNG', compress_level=1)
+        return buffer.getvalue()
+
+    def get_fields(self):
+        return {
+            'name': 'Рецепт', 'text': 'Описание', 'cooking_time': 10,
+            'tags': [self.tag.pk],
+            'ingredients': [{'id': self.ingredient.pk, 'amount': 1}],
+        }
+
+    def json_request(self, image: bytes):
+        data = self.get_fields()
+        data['image'] = ('data:image/png;base64,'
+                         + base64.b64encode(image).decode())
+        body = json.dumps(data).encode()
+        return body, APIRequestFactory().generic(
+            'POST', self.url, body, content_type='application/json'
+        )
+
+    def multipart_request(self, image: bytes):
+        body = encode_multipart(BOUNDARY, {
+            'data': json.dumps(self.get_fields()),
+            'image': SimpleUploadedFile('image.png', image, 'image/png'),
+        })
+        return body, APIRequestFactory().generic(
+            'POST', self.url, body, content_type=MULTIPART_CONTENT
+        )
+
+    def test_upload(self):
+        view = RecipeViewSet.as_view({'post': 'create'})
+        results = [('', 'image', 'request', 'peak memory', 'seconds')]
+        for name, make_request in (
+            ('base64 in json', self.json_request),
+            ('multipart/form-data', self.multipart_request),
+        ):
+            image = self.make_image()
+            body, request = make_request(image)
+            force_authenticate(request, self.user)
+            response, peak, seconds = measure(view, request)
+            # as request handler does, uploaded temporary files are closed
+            request.close()
+            self.assertEqual(response.status_code, 201, response.data)
+            results.append((
+                name, megabytes(len(image)), megabytes(len(body)),
+                megabytes(peak), f'{seconds:.2f}'
+            ))
+        report('Recipe creation with image', results)
@@ -0,0 +1,107 @@
+import hashlib
+
+from django.http import HttpResponse
+from rest_framework.exceptions import NotFound
+from rest_framework.renderers import JSONRenderer
+
+from .models import IngredientDescription, Tag
+from .serializers import IngredientDescriptionSerializer, TagSerializer
+from .snapshots import VersionedSnapshot
+
+
+class Catalogue(VersionedSnapshot):
+    """
+    Serialized copy of a small reference table kept in process memory.
+    """
+
+    def __init__(self, name: str, queryset, serializer_class):
+        super().__init__()
+        self.version_key = f'catalogue_version_{name}'
+        self.queryset = queryset
+        self.serializer_class = serializer_class
+
+    def build_data(self):
+        """
+        :return: (etag, ((instance, json bytes), ...), {pk: json bytes},
+            bytes of all rows)
+        """
+        renderer = JSONRenderer()
+        rows = tuple(
+            (instance, renderer.render(self.serializer_class(instance).data))
+            for instance in self.queryset.all()
+        )
+        by_pk = {instance.pk: data for instance, data in rows}
+        all_rows = self.join(data for _, data in rows)
+        # etag depends on content, not on version, so it is right
+        # after a rebuild caused by timeout too
+        etag = hashlib.sha1(all_rows).hexdigest()
+        return etag, rows, by_pk, all_rows
+
+    @staticmethod
+    def join(items) -> bytes:
+        return b'[' + b','.join(items) + b']'
+
+    def get_etag(self) -> str:
+        return self.get_snapshot()[2]
+
+    def list_json(self, predicate=None) -> bytes:
+        """
+        :param predicate: function to filter instances
+        """
+        _, _, _, rows, _, all_rows = self.get_snapshot()
+        if predicate is None:
+            return all_rows
+        return self.join(
+            data for instance, data in rows if predicate(instance)
+        )
+
+    def get_json(self, pk):
+        """
+        :return: json bytes or None if there is no such pk
+        """
+        return self.get_snapshot()[4].get(pk)
+
+
+class CatalogueResponse(HttpResponse):
+    def __init__(self, content, **kwargs):
+        kwargs.setdefault('content_type', 'application/json')
+        super().__init__(content, **kwargs)
+
+
+class CatalogueViewMixin:
+    """
+    list and retrieve of a viewset served from the catalogue
+    """
+    catalogue = None
+
+    def get_list_etag(self):
+        return self.catalogue.get_etag()
+
+    def get_retrieve_etag(self):
+        return self.catalogue.get_etag()
+
+    def get_list_predicate(self):
+        return None
+
+    def list(self, request, *args, **kwargs):
+        return CatalogueResponse(
+            self.catalogue.list_json(self.get_list_predicate())
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            pk = int(self.kwargs[lookup_url_kwarg])
+        except ValueError:
+            raise NotFound
+        data = self.catalogue.get_json(pk)
+        if data is None:
+            raise NotFound
+        return CatalogueResponse(data)
+
+
+tags_catalogue = Catalogue('tags', Tag.objects.all(), TagSerializer)
+ingredients_catalogue = Catalogue(
+    'ingredients', IngredientDescription.objects.all(),
+    IngredientDescriptionSerializer
+)
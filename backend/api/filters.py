@@ -1,6 +1,10 @@
 import django_filters
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connections
+from django.db.models import (Case, Exists, F, FloatField, OuterRef, Q, Value,
+                              When)
 
-from .models import Recipe, IngredientDescription
+from .models import Cart, Favorite, IngredientDescription, Recipe
 
 
 class RecipeFilter(django_filters.FilterSet):
@@ -10,42 +14,94 @@ class RecipeFilter(django_filters.FilterSet):
     tags = django_filters.CharFilter(field_name='tags', method='filter_tags')
     is_in_shopping_cart = django_filters.CharFilter(
         field_name='is_in_shopping_cart', method='filter_is_in_shopping_cart')
+    search = django_filters.CharFilter(
+        field_name='search', method='filter_search')
+    ordering = django_filters.CharFilter(
+        field_name='ordering', method='filter_ordering')
 
     class Meta:
         model = Recipe
         fields = ['author']
 
     def filter_is_favorited(self, queryset, name, value):
-        if value == 'true':
-            queryset = Recipe.objects.filter(
-                favorites__recipe__in=queryset.values_list('pk', flat=True),
-                favorites__user=self.request.user
-            ).all()
-        elif value == 'false':
-            queryset = Recipe.objects.exclude(
-                favorites__recipe__in=queryset.values_list('pk', flat=True),
-                favorites__user=self.request.user
-            ).all()
-        return queryset
+        return self.filter_user_relation(queryset, Favorite, value)
 
     def filter_tags(self, queryset, name, value):
-        tags_slug = self.request.query_params.getlist('tags')
-        queryset = queryset.filter(tags__slug__in=tags_slug).distinct().all()
-        return queryset
+        """
+        recipes with any of tags, or with all of them if tags_match=all
+        """
+        tags_slug = set(self.request.query_params.getlist('tags'))
+        recipe_tags = Recipe.tags.through.objects.filter(recipe=OuterRef('pk'))
+        if self.request.query_params.get('tags_match') == 'all':
+            for slug in tags_slug:
+                queryset = queryset.filter(
+                    Exists(recipe_tags.filter(tag__slug=slug))
+                )
+            return queryset
+        return queryset.filter(
+            Exists(recipe_tags.filter(tag__slug__in=tags_slug))
+        )
 
     def filter_is_in_shopping_cart(self, queryset, name, value):
-        if value == 'true':
+        return self.filter_user_relation(queryset, Cart, value)
+
+    def filter_search(self, queryset, name, value):
+        """
+        full text search over name and text ordered by rank,
+        matches in name are ranked above matches in text.
+        Not postgres databases (development) use icontains of every word
+        """
+        value = value.strip()
+        if not value:
+            return queryset
+        if connections[queryset.db].vendor == 'postgresql':
+            query = SearchQuery(
+                value, config='russian', search_type='websearch'
+            )
+            return queryset.filter(search_vector=query).annotate(
+                search_rank=SearchRank(F('search_vector'), query)
+            ).order_by('-search_rank', '-pub_date', '-id')
+        for word in value.split():
             queryset = queryset.filter(
-                in_cart__recipe__in=queryset.values_list('pk', flat=True),
-                in_cart__user=self.request.user
-            ).all()
-        elif value == 'false':
-            queryset = queryset.exclude(
-                in_cart__recipe__in=queryset.values_list('pk', flat=True),
-                in_cart__user=self.request.user
-            ).all()
+                Q(name__icontains=word) | Q(text__icontains=word)
+            )
+        return queryset.annotate(
+            search_rank=Case(
+                When(name__icontains=value, then=Value(1.0)),
+                default=Value(0.5),
+                output_field=FloatField(),
+            )
+        ).order_by('-search_rank', '-pub_date', '-id')
+
+    def filter_ordering(self, queryset, name, value):
+        """
+        ordering=popular: by popularity from update_popularity command
+        """
+        if value == 'popular':
+            return queryset.order_by(
+                F('popularity__score').desc(nulls_last=True),
+                '-pub_date', '-id'
+            )
         return queryset
 
+    def filter_user_relation(self, queryset, model, value):
+        """
+        recipes which are (value='true') or are not (value='false')
+        linked with current user by model
+        :param model: Favorite or Cart
+        """
+        if value not in ('true', 'false'):
+            return queryset
+        user = self.request.user
+        if user.is_anonymous:
+            return queryset.none() if value == 'true' else queryset
+        user_relation = Exists(
+            model.objects.filter(user=user, recipe=OuterRef('pk'))
+        )
+        if value == 'true':
+            return queryset.filter(user_relation)
+        return queryset.filter(~user_relation)
+
 
 class CustomIngredientsFilter(django_filters.FilterSet):
     name = django_filters.CharFilter(
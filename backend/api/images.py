@@ -0,0 +1,138 @@
+import io
+import posixpath
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from .models import Recipe
+from .storages import lock_file_name
+
+# format: (extension, Pillow save options)
+FORMATS = {
+    'jpeg': ('jpg', {'quality': 85, 'optimize': True, 'progressive': True}),
+    'webp': ('webp', {'quality': 80, 'method': 4}),
+}
+
+
+def get_derivative_name(image_name: str, size: str, image_format: str):
+    """
+    name of derivative in storage, it depends only on the original name,
+    so urls are built without touching storage
+    """
+    stem = posixpath.splitext(posixpath.basename(image_name))[0]
+    extension = FORMATS[image_format][0]
+    return posixpath.join(
+        settings.RECIPE_IMAGE_DERIVATIVES_DIR, f'{stem}_{size}.{extension}'
+    )
+
+
+def get_derivative_urls(image_name: str) -> dict:
+    """
+    :return: {size: {format: url}}
+    """
+    return {
+        size: {
+            image_format: default_storage.url(
+                get_derivative_name(image_name, size, image_format)
+            )
+            for image_format in FORMATS
+        }
+        for size in settings.RECIPE_IMAGE_SIZES
+    }
+
+
+def has_derivatives(image_name: str) -> bool:
+    """
+    derivatives are written in order of RECIPE_IMAGE_SIZES and FORMATS,
+    so the last of them exists only if all were made
+    """
+    size = list(settings.RECIPE_IMAGE_SIZES)[-1]
+    image_format = list(FORMATS)[-1]
+    return default_storage.exists(
+        get_derivative_name(image_name, size, image_format)
+    )
+
+
+def to_rgb(image: Image.Image) -> Image.Image:
+    """
+    rotate image by exif and put transparent images on white background
+    """
+    image = ImageOps.exif_transpose(image)
+    if image.mode in ('RGBA', 'LA') or 'transparency' in image.info:
+        image = image.convert('RGBA')
+        background = Image.new('RGBA', image.size, 'white')
+        return Image.alpha_composite(background, image).convert('RGB')
+    return image.convert('RGB')
+
+
+def fit(image: Image.Image, width: int, height: int,
+        crop: bool) -> Image.Image:
+    """
+    crop and scale image to width x height box or scale it to fit within
+    the box without cropping, small images are not upscaled
+    """
+    if not crop:
+        image = image.copy()
+        image.thumbnail((width, height), Image.LANCZOS)
+        return image
+    scale = min(1, image.width / width, image.height / height)
+    box = (max(1, round(width * scale)), max(1, round(height * scale)))
+    return ImageOps.fit(image, box, Image.LANCZOS)
+
+
+def make_derivatives(image_name: str):
+    """
+    write all sizes and formats of image to storage, existing
+    derivatives are replaced. Then recipes with the image are marked
+    :param image_name: name of original image in storage
+    """
+    storage = Recipe._meta.get_field('image').storage
+    with storage.open(image_name, 'rb') as file:
+        original = to_rgb(Image.open(file))
+    for size, (width, height, crop) in settings.RECIPE_IMAGE_SIZES.items():
+        image = fit(original, width, height, crop)
+        for image_format, (_, options) in FORMATS.items():
+            buffer = io.BytesIO()
+            image.save(buffer, image_format, **options)
+            name = get_derivative_name(image_name, size, image_format)
+            default_storage.delete(name)
+            default_storage.save(name, ContentFile(buffer.getvalue()))
+    set_derivatives_ready(image_name)
+
+
+def set_derivatives_ready(image_name: str):
+    """
+    mark recipes with the image, updated_at is changed for their ETag
+    """
+    Recipe.objects.filter(
+        image=image_name, image_derivatives_ready=False
+    ).update(image_derivatives_ready=True, updated_at=timezone.now())
+
+
+def delete_derivatives(image_name: str):
+    for size in settings.RECIPE_IMAGE_SIZES:
+        for image_format in FORMATS:
+            default_storage.delete(
+                get_derivative_name(image_name, size, image_format)
+            )
+
+
+def release_image(image_name: str):
+    """
+    delete recipe image and its derivatives if no recipe refers to it,
+    images are shared by recipes (see ContentAddressedStorage).
+    The name is locked as on saving, so a recipe which is saved with
+    the image at the moment is committed before the check
+    """
+    if not image_name:
+        return
+    with transaction.atomic():
+        lock_file_name(image_name)
+        if Recipe.objects.filter(image=image_name).exists():
+            return
+        Recipe._meta.get_field('image').storage.delete(image_name)
+        delete_derivatives(image_name)
@@ -0,0 +1,70 @@
+from array import array
+from collections import Counter
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import IngredientQuantity
+from .snapshots import VersionedSnapshot
+
+
+def rank_recipes(matched: dict, totals: dict) -> list:
+    """
+    :param matched: {recipe_id: number of given ingredients in recipe}
+    :param totals: {recipe_id: number of all ingredients of recipe}
+    :return: [(recipe_id, matched, missing), ...] the most matched
+        and the least missing first
+    """
+    ranking = [
+        (recipe_id, count, totals[recipe_id] - count)
+        for recipe_id, count in matched.items()
+    ]
+    ranking.sort(key=lambda item: (-item[1], item[2], -item[0]))
+    return ranking
+
+
+class IngredientIndex(VersionedSnapshot):
+    """
+    Inverted index ingredient -> recipes kept in process memory,
+    used by RecipeViewSet.by_ingredients if
+    RECIPE_INGREDIENT_INDEX_IN_MEMORY is set.
+    """
+    version_key = 'ingredient_index_version'
+
+    def build_data(self):
+        """
+        :return: ({ingredient_id: array of recipe ids},
+            {recipe_id: number of ingredients})
+        """
+        postings = {}
+        totals = Counter()
+        rows = IngredientQuantity.objects.values_list(
+            'ingredient', 'recipe'
+        ).order_by().iterator(chunk_size=10000)
+        for ingredient_id, recipe_id in rows:
+            if ingredient_id not in postings:
+                postings[ingredient_id] = array('q')
+            postings[ingredient_id].append(recipe_id)
+            totals[recipe_id] += 1
+        return postings, dict(totals)
+
+    def invalidate_on_commit(self):
+        """
+        invalidate after commit of changed recipe ingredients,
+        nothing to do if the in-memory mode is off
+        """
+        if settings.RECIPE_INGREDIENT_INDEX_IN_MEMORY:
+            transaction.on_commit(self.invalidate)
+
+    def rank(self, ingredient_ids) -> list:
+        """
+        :return: [(recipe_id, matched, missing), ...], see rank_recipes
+        """
+        _, _, postings, totals = self.get_snapshot()
+        matched = Counter()
+        for ingredient_id in set(ingredient_ids):
+            matched.update(postings.get(ingredient_id, ()))
+        return rank_recipes(matched, totals)
+
+
+ingredient_index = IngredientIndex()
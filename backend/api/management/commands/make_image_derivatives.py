@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from api.images import has_derivatives, make_derivatives, set_derivatives_ready
+from api.models import Recipe
+
+
+class Command(BaseCommand):
+    help = ('Создание уменьшенных копий изображений рецептов, '
+            'которых еще нет в хранилище')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Пересоздать копии всех изображений (после смены размеров)'
+        )
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.exclude(image='')
+        if not options['all']:
+            recipes = recipes.filter(image_derivatives_ready=False)
+        # recipes share equal images
+        image_names = recipes.order_by('image').values_list(
+            'image', flat=True
+        ).distinct()
+        created = 0
+        for image_name in list(image_names):
+            if options['all'] or not has_derivatives(image_name):
+                make_derivatives(image_name)
+                created += 1
+            else:
+                set_derivatives_ready(image_name)
+        self.stdout.write(f'Обработано изображений: {created}')
@@ -0,0 +1,52 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from api.models import Cart, Favorite, Recipe
+
+User = get_user_model()
+
+
+def count_subquery(queryset, field: str):
+    """
+    number of queryset rows linked by field with outer row
+    """
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{field: OuterRef('pk')}).order_by()
+            .values(field).annotate(count=Count('pk')).values('count'),
+            output_field=IntegerField()
+        ),
+        0
+    )
+
+
+def reconcile(queryset, field: str, actual) -> int:
+    """
+    set counter field to actual value where it differs
+    :return: number of fixed rows
+    """
+    drifted = (
+        queryset.annotate(actual=actual)
+        .exclude(**{field: F('actual')})
+        .values('pk')
+    )
+    return queryset.filter(pk__in=drifted).update(**{field: actual})
+
+
+class Command(BaseCommand):
+    help = 'Пересчет счетчиков избранного, корзин и рецептов авторов'
+
+    def handle(self, *args, **options):
+        counters = (
+            (Recipe.objects.all(), 'favorites_count',
+             count_subquery(Favorite.objects.all(), 'recipe')),
+            (Recipe.objects.all(), 'carts_count',
+             count_subquery(Cart.objects.all(), 'recipe')),
+            (User.objects.all(), 'recipes_count',
+             count_subquery(Recipe.objects.all(), 'author')),
+        )
+        for queryset, field, actual in counters:
+            fixed = reconcile(queryset, field, actual)
+            self.stdout.write(f'{field}: исправлено {fixed}')
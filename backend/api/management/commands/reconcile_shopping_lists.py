@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from api.models import Cart, ShoppingListItem
+
+
+class Command(BaseCommand):
+    help = 'Пересчет сохраненных списков покупок по корзинам пользователей'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch', type=int, default=500,
+            help='Количество пользователей в одной транзакции'
+        )
+
+    def handle(self, *args, **options):
+        users = sorted(
+            set(Cart.objects.values_list('user', flat=True))
+            | set(ShoppingListItem.objects.values_list('user', flat=True))
+        )
+        fixed = 0
+        for start in range(0, len(users), options['batch']):
+            fixed += ShoppingListItem.objects.refresh(
+                users[start:start + options['batch']]
+            )
+        self.stdout.write(f'Исправлено строк списков: {fixed}')
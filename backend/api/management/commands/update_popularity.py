@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from api.models import RecipePopularity
+
+
+class Command(BaseCommand):
+    help = ('Расчет популярности рецептов, измененных с прошлого запуска. '
+            'Запускается по расписанию (cron)')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full', action='store_true',
+            help='Пересчитать все рецепты'
+        )
+
+    def handle(self, *args, **options):
+        updated = RecipePopularity.objects.update_scores(full=options['full'])
+        self.stdout.write(f'Пересчитано рецептов: {updated}')
@@ -0,0 +1,165 @@
+import math
+
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import F, Max, Q, Sum
+from django.utils import timezone
+
+
+class ShoppingListItemManager(models.Manager):
+
+    def refresh(self, users, ingredients=None) -> int:
+        """
+        recalculate stored shopping list of users from their carts.
+        Refreshes of the same user are serialized by lock of user row,
+        so concurrent cart changes see each other's committed rows.
+        :param users: ids of users (or their queryset) whose lists
+            are changed
+        :param ingredients: ingredients or their ids to recalculate,
+            all ingredients of the users if None
+        :return: number of changed list rows
+        """
+        quantity_model = apps.get_model('api', 'IngredientQuantity')
+        with transaction.atomic():
+            # users are locked in the same order to avoid deadlocks
+            users = list(
+                get_user_model().objects.select_for_update()
+                .filter(pk__in=users).order_by('pk')
+                .values_list('pk', flat=True)
+            )
+            if not users:
+                return 0
+            totals = quantity_model.objects.filter(
+                recipe__in_cart__user__in=users
+            )
+            items = self.filter(user__in=users)
+            if ingredients is not None:
+                totals = totals.filter(ingredient__in=ingredients)
+                items = items.filter(ingredient__in=ingredients)
+            totals = {
+                (row['recipe__in_cart__user'], row['ingredient']):
+                    row['amounts']
+                for row in totals.values('recipe__in_cart__user', 'ingredient')
+                .annotate(amounts=Sum('amount'))
+            }
+
+            to_update = []
+            to_delete = []
+            for item in items:
+                amount = totals.pop((item.user_id, item.ingredient_id), None)
+                if amount is None:
+                    to_delete.append(item.pk)
+                elif item.amount != amount:
+                    item.amount = amount
+                    to_update.append(item)
+            if to_delete:
+                self.filter(pk__in=to_delete).delete()
+            if to_update:
+                self.bulk_update(to_update, ['amount'])
+            if totals:
+                self.bulk_create(
+                    self.model(
+                        user_id=user_id, ingredient_id=ingredient_id,
+                        amount=amount
+                    )
+                    for (user_id, ingredient_id), amount in totals.items()
+                )
+        return len(to_delete) + len(to_update) + len(totals)
+
+
+class RecipePopularityManager(models.Manager):
+
+    def get_log_weight(self, created) -> float:
+        """
+        log2 of weight of activity at created time. Weights grow with time
+        instead of decay of old ones, so the order of already calculated
+        scores stays right and only touched recipes are recalculated.
+        Weights themselves overflow float in about 1024 half-lives after
+        the epoch, their logarithms grow linearly.
+        """
+        age = created - settings.POPULARITY_EPOCH
+        return age.total_seconds() / settings.POPULARITY_HALF_LIFE
+
+    @staticmethod
+    def add_log(first: float, second: float) -> float:
+        """
+        log2(2 ** first + 2 ** second) without overflow
+        """
+        high, low = max(first, second), min(first, second)
+        return high + math.log2(1 + 2 ** (low - high))
+
+    def get_touched_recipes(self, since) -> set:
+        """
+        recipes with new activity after since, or with removed one
+        (counters differ from the ones at the last calculation)
+        """
+        touched = set()
+        for model_name in ('Favorite', 'Cart'):
+            touched.update(
+                apps.get_model('api', model_name).objects
+                .filter(created__gte=since).values_list('recipe', flat=True)
+            )
+        touched.update(
+            self.exclude(
+                favorites_count=F('recipe__favorites_count'),
+                carts_count=F('recipe__carts_count'),
+            ).values_list('recipe', flat=True)
+        )
+        return touched
+
+    def update_scores(self, full: bool = False) -> int:
+        """
+        recalculate scores of recipes touched since the last calculation
+        :param full: recalculate all recipes
+        :return: number of recalculated recipes
+        """
+        recipe_model = apps.get_model('api', 'Recipe')
+        now = timezone.now()
+        since = None if full else self.aggregate(
+            last=Max('computed_at'))['last']
+        if since is None:
+            recipe_ids = set(recipe_model.objects.filter(
+                Q(favorites_count__gt=0) | Q(carts_count__gt=0)
+                | Q(popularity__isnull=False)
+            ).values_list('pk', flat=True))
+        else:
+            recipe_ids = self.get_touched_recipes(since)
+        if not recipe_ids:
+            return 0
+
+        activities = (
+            (apps.get_model('api', 'Favorite'),
+             settings.POPULARITY_FAVORITE_WEIGHT),
+            (apps.get_model('api', 'Cart'), settings.POPULARITY_CART_WEIGHT),
+        )
+        # score is log2 of sum of weights, None without activity
+        scores = {}
+        for model, weight in activities:
+            log_weight = math.log2(weight)
+            rows = model.objects.filter(
+                recipe__in=recipe_ids, created__lt=now
+            ).values_list('recipe', 'created').iterator()
+            for recipe_id, created in rows:
+                score = log_weight + self.get_log_weight(created)
+                if recipe_id in scores:
+                    score = self.add_log(scores[recipe_id], score)
+                scores[recipe_id] = score
+        counters = recipe_model.objects.filter(
+            pk__in=recipe_ids).values_list(
+            'pk', 'favorites_count', 'carts_count')
+
+        with transaction.atomic():
+            self.filter(recipe__in=recipe_ids).delete()
+            self.bulk_create(
+                self.model(
+                    recipe_id=recipe_id,
+                    score=scores.get(recipe_id),
+                    favorites_count=favorites_count,
+                    carts_count=carts_count,
+                    computed_at=now,
+                )
+                for recipe_id, favorites_count, carts_count in counters
+            )
+        return len(recipe_ids)
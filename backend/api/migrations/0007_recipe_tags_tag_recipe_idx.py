@@ -0,0 +1,20 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """
+    Index for lookups of recipes by tag in auto created Recipe.tags table,
+    unique (recipe_id, tag_id) index covers lookups of tags by recipe.
+    """
+
+    dependencies = [
+        ('api', '0006_recipe_pub_date_id_idx'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            'CREATE INDEX api_recipe_tags_tag_recipe_idx '
+            'ON api_recipe_tags (tag_id, recipe_id)',
+            'DROP INDEX api_recipe_tags_tag_recipe_idx',
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 3.2.7 on 2026-10-17 01:43
+
+import api.storages
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_recipepopularity'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recipe',
+            name='image',
+            field=models.ImageField(db_index=True, storage=api.storages.ContentAddressedStorage(), upload_to='recipes/images', verbose_name='Изображение рецепта'),
+        ),
+    ]
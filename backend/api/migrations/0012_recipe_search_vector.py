@@ -0,0 +1,64 @@
+# Generated by Django 3.2.7 on 2026-10-17 01:44
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+SEARCH_VECTOR = (
+    "setweight(to_tsvector('russian', coalesce(NEW.name, '')), 'A') || "
+    "setweight(to_tsvector('russian', coalesce(NEW.text, '')), 'B')"
+)
+
+
+def create_search_trigger(apps, schema_editor):
+    # the vector is kept by the database, so it is right after
+    # queryset updates, bulk operations and manual sql too
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        'CREATE OR REPLACE FUNCTION api_recipe_search_vector_update() '
+        'RETURNS trigger AS $$ BEGIN '
+        f'NEW.search_vector := {SEARCH_VECTOR}; '
+        'RETURN NEW; END $$ LANGUAGE plpgsql'
+    )
+    schema_editor.execute(
+        'CREATE TRIGGER api_recipe_search_vector_trigger '
+        'BEFORE INSERT OR UPDATE OF name, text ON api_recipe '
+        'FOR EACH ROW EXECUTE PROCEDURE api_recipe_search_vector_update()'
+    )
+    schema_editor.execute(
+        'UPDATE api_recipe SET search_vector = '
+        + SEARCH_VECTOR.replace('NEW.', '')
+    )
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS api_recipe_search_vector_idx '
+        'ON api_recipe USING gin (search_vector)'
+    )
+
+
+def drop_search_trigger(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS api_recipe_search_vector_idx')
+    schema_editor.execute(
+        'DROP TRIGGER IF EXISTS api_recipe_search_vector_trigger '
+        'ON api_recipe'
+    )
+    schema_editor.execute(
+        'DROP FUNCTION IF EXISTS api_recipe_search_vector_update()'
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_recipe_image_content_addressed'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Поисковый вектор'),
+        ),
+        migrations.RunPython(create_search_trigger, drop_search_trigger),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 3.2.7 on 2026-10-17 01:45
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_recipe_search_vector'),
+    ]
+
+    operations = [
+        # composite index first, it replaces single ingredient_id one
+        migrations.AddIndex(
+            model_name='ingredientquantity',
+            index=models.Index(fields=['ingredient', 'recipe'], name='ingredient_recipe_idx'),
+        ),
+        migrations.AlterField(
+            model_name='ingredientquantity',
+            name='ingredient',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='api.ingredientdescription'),
+        ),
+    ]
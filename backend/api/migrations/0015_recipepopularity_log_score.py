@@ -0,0 +1,25 @@
+# Generated by Django 3.2.7 on 2026-10-17 02:19
+
+from django.db import migrations, models
+
+
+def delete_scores(apps, schema_editor):
+    # old scores are not in log space, without rows the next
+    # update_popularity recalculates all recipes
+    apps.get_model('api', 'RecipePopularity').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_recipe_image_derivatives_ready'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recipepopularity',
+            name='score',
+            field=models.FloatField(db_index=True, null=True, verbose_name='Популярность'),
+        ),
+        migrations.RunPython(delete_scores, migrations.RunPython.noop),
+    ]
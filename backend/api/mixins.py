@@ -0,0 +1,95 @@
+from django.db import transaction
+from django.utils.cache import (get_conditional_response, patch_vary_headers,
+                                quote_etag)
+from rest_framework.response import Response
+
+from .serializers import BulkIdsSerializer
+
+
+class ConditionalGetMixin:
+    """
+    ETag for list and retrieve actions. If the client already has
+    actual data 304 is returned without building of the body.
+
+    View must define get_list_etag and get_retrieve_etag returning
+    etag or None. Last-Modified is not sent, responses depend on data
+    without modification time (favorites, cart and subscriptions
+    of user, which rows are on the page).
+    """
+    conditional_vary_headers = ()
+
+    def list(self, request, *args, **kwargs):
+        return self.get_conditional_response(
+            self.get_list_etag(), super().list, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_conditional_response(
+            self.get_retrieve_etag(), super().retrieve,
+            request, *args, **kwargs
+        )
+
+    def get_conditional_response(self, etag, view, request, *args, **kwargs):
+        etag = quote_etag(etag) if etag else None
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = view(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            if etag:
+                response['ETag'] = etag
+            if self.conditional_vary_headers:
+                patch_vary_headers(response, self.conditional_vary_headers)
+        return response
+
+
+class BulkLinkMixin:
+    """
+    Add or remove links of current user with many objects at once
+    (favorites, cart, subscriptions). Request data: {"ids": [...]}.
+    Response has status for every id: added, already_added,
+    removed, not_added, not_found.
+    """
+
+    @transaction.atomic
+    def bulk_link(self, request, model, field: str, targets, after_add=None):
+        """
+        Links are created by bulk_create, it doesn't send post_save,
+        side effects are done once for all objects by after_add.
+        Links are deleted by one queryset delete, which sends post_delete
+        for every row (see RecipeChanges.batch for batching of them).
+        :param model: model of link with user and field
+        :param field: name of foreign key to linked object
+        :param targets: queryset of objects which can be linked
+        :param after_add: function called with ids of added objects
+        """
+        serializer = BulkIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = list(dict.fromkeys(serializer.validated_data['ids']))
+        found = set(targets.filter(pk__in=ids).values_list('pk', flat=True))
+        links = model.objects.filter(
+            user=request.user, **{f'{field}__in': found}
+        )
+        linked = set(links.values_list(field, flat=True))
+
+        if request.method == 'DELETE':
+            if linked:
+                links.delete()
+            statuses = {pk: 'removed' for pk in linked}
+            statuses.update(
+                {pk: 'not_added' for pk in found - linked}
+            )
+        else:
+            added = found - linked
+            model.objects.bulk_create(
+                [model(user=request.user, **{f'{field}_id': pk})
+                 for pk in added],
+                ignore_conflicts=True
+            )
+            if added and after_add is not None:
+                after_add(added)
+            statuses = {pk: 'added' for pk in added}
+            statuses.update({pk: 'already_added' for pk in linked})
+        return Response({'results': [
+            {'id': pk, 'status': statuses.get(pk, 'not_found')}
+            for pk in ids
+        ]})
@@ -1,8 +1,12 @@
 import django.core.validators as validators
 from django.contrib import admin
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 
+from .managers import RecipePopularityManager, ShoppingListItemManager
+from .storages import ContentAddressedStorage
+
 User = get_user_model()
 
 
@@ -64,9 +68,18 @@ class Recipe(models.Model):
         'Название рецепта',
         max_length=200,
     )
+    # equal images are stored once, index is used to find
+    # other recipes with the image before it is deleted
     image = models.ImageField(
         upload_to='recipes/images',
+        storage=ContentAddressedStorage(),
         verbose_name='Изображение рецепта',
+        db_index=True,
+    )
+    # set after derivatives of image are made (see api/images.py),
+    # until then only the original image is returned
+    image_derivatives_ready = models.BooleanField(
+        'Копии изображения готовы', default=False, editable=False
     )
     text = models.TextField('Описание рецепта')
     ingredients = models.ManyToManyField(
@@ -91,25 +104,53 @@ class Recipe(models.Model):
         'Дата публикации',
         auto_now_add=True,
     )
+    updated_at = models.DateTimeField(
+        'Дата изменения',
+        auto_now=True,
+    )
+    favorites_count = models.PositiveIntegerField(
+        'Добавили в избранное',
+        default=0,
+    )
+    carts_count = models.PositiveIntegerField(
+        'Добавили в корзину',
+        default=0,
+    )
+    # name (weight A) and text (weight B), filled by trigger on postgres,
+    # see migration 0012 and RecipeFilter.filter_search
+    search_vector = SearchVectorField(
+        'Поисковый вектор', null=True, editable=False
+    )
 
     class Meta:
         ordering = ['pub_date']
         verbose_name = 'рецепт'
         verbose_name_plural = 'рецепты'
+        indexes = [
+            models.Index(
+                fields=['pub_date', 'id'], name='recipe_pub_date_id_idx'
+            ),
+            models.Index(
+                fields=['author', 'pub_date', 'id'],
+                name='recipe_author_pub_date_idx'
+            ),
+        ]
 
     def __str__(self):
         return f'<№{self.pk}, {self.name[:50]}>'
 
     @admin.display(description='Добавили в избранное')
     def in_favorite_count(self):
-        return self.favorites.count()
+        return self.favorites_count
 
 
 class IngredientQuantity(models.Model):
     recipe = models.ForeignKey(to=Recipe, on_delete=models.CASCADE)
+    # indexed by ingredient_recipe_idx
     ingredient = models.ForeignKey(
         to=IngredientDescription,
-        on_delete=models.CASCADE
+        on_delete=models.CASCADE,
+        db_index=False,
     )
     amount = models.IntegerField(
         'Количество',
@@ -129,6 +170,13 @@ class IngredientQuantity(models.Model):
                 name='unique_recipe_ingredient'
             )
         ]
+        # reverse lookups of recipes by ingredients, see
+        # RecipeViewSet.by_ingredients
+        indexes = [
+            models.Index(
+                fields=['ingredient', 'recipe'], name='ingredient_recipe_idx'
+            ),
+        ]
 
     def __str__(self):
         return f'<{self.ingredient.name}, amount:{self.amount}>'
@@ -144,6 +192,11 @@ class Favorite(models.Model):
         related_name='favorites',
         verbose_name='Рецепт'
     )
+    created = models.DateTimeField(
+        'Дата добавления',
+        auto_now_add=True,
+        db_index=True,
+    )
 
     class Meta:
         ordering = ['pk']
@@ -168,6 +221,11 @@ class Cart(models.Model):
         Recipe, related_name='in_cart',
         on_delete=models.CASCADE,
     )
+    created = models.DateTimeField(
+        'Дата добавления',
+        auto_now_add=True,
+        db_index=True,
+    )
 
     class Meta:
         ordering = ['pk']
@@ -181,3 +239,68 @@ class Cart(models.Model):
 
     def __str__(self):
         return f'<{self.pk}>'
+
+
+class ShoppingListItem(models.Model):
+    """
+    Ingredients from recipes in user cart with summed amounts.
+    Kept in sync with Cart and IngredientQuantity.
+    """
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE,
+        related_name='shopping_list',
+        verbose_name='Пользователь'
+    )
+    ingredient = models.ForeignKey(
+        IngredientDescription, on_delete=models.CASCADE,
+        verbose_name='Ингредиент'
+    )
+    amount = models.PositiveIntegerField('Количество')
+
+    objects = ShoppingListItemManager()
+
+    class Meta:
+        ordering = ['pk']
+        verbose_name = 'позиция списка покупок'
+        verbose_name_plural = 'список покупок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='unique_user_ingredient_shopping_list'
+            )
+        ]
+
+    def __str__(self):
+        return f'<{self.ingredient.name}, amount:{self.amount}>'
+
+
+class RecipePopularity(models.Model):
+    """
+    Time-decayed popularity of recipe by Favorite and Cart activity,
+    calculated by update_popularity command.
+    """
+    recipe = models.OneToOneField(
+        Recipe, on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='popularity',
+        verbose_name='Рецепт'
+    )
+    # log2 of time-weighted activity, see RecipePopularityManager
+    score = models.FloatField('Популярность', null=True, db_index=True)
+    favorites_count = models.PositiveIntegerField(
+        'Избранное при расчете', default=0
+    )
+    carts_count = models.PositiveIntegerField(
+        'Корзины при расчете', default=0
+    )
+    computed_at = models.DateTimeField('Дата расчета')
+
+    objects = RecipePopularityManager()
+
+    class Meta:
+        ordering = ['-score']
+        verbose_name = 'популярность рецепта'
+        verbose_name_plural = 'популярность рецептов'
+
+    def __str__(self):
+        return f'<{self.recipe_id}, score:{self.score}>'
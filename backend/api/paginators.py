@@ -1,7 +1,159 @@
+import base64
+from collections import OrderedDict
+
+from django.core.paginator import Paginator as DjangoPaginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 
 
 class CustomPagination(PageNumberPagination):
     page_size = 10
     page_size_query_param = 'limit'
     max_page_size = 100
+
+
+class RecipePagination(CustomPagination):
+    """
+    page/limit pagination, options:
+    - count=false: all recipes are not counted, count is null in response;
+    - cursor: keyset pagination ordered by (pub_date, id), empty cursor
+      for the first page, next link contains cursor of the following one.
+    """
+    cursor_query_param = 'cursor'
+    cursor_descending = False
+    count_query_param = 'count'
+    invalid_cursor_message = 'Неверный курсор.'
+    # count of the same queryset known in advance, e.g. by the view
+    known_count = None
+
+    def django_paginator_class(self, queryset, page_size):
+        paginator = DjangoPaginator(queryset, page_size)
+        if self.known_count is not None:
+            paginator.count = self.known_count
+        return paginator
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.count = None
+        if self.cursor_query_param in request.query_params:
+            self.mode = 'cursor'
+            return self.paginate_by_cursor(queryset, request)
+        if request.query_params.get(self.count_query_param) == 'false':
+            self.mode = 'no_count'
+            return self.paginate_without_count(queryset, request)
+        self.mode = 'page'
+        page = super().paginate_queryset(queryset, request, view)
+        self.count = self.page.paginator.count
+        return page
+
+    def paginate_without_count(self, queryset, request):
+        page_size = self.get_page_size(request)
+        try:
+            self.page_number = int(
+                request.query_params.get(self.page_query_param, 1)
+            )
+        except ValueError:
+            self.page_number = 0
+        if self.page_number < 1:
+            raise NotFound(self.invalid_page_message)
+        offset = (self.page_number - 1) * page_size
+        # one more row tells if there is the next page
+        rows = list(queryset[offset:offset + page_size + 1])
+        self.has_next = len(rows) > page_size
+        return rows[:page_size]
+
+    def paginate_by_cursor(self, queryset, request):
+        page_size = self.get_page_size(request)
+        position = self.decode_cursor(
+            request.query_params.get(self.cursor_query_param)
+        )
+        if self.cursor_descending:
+            queryset = queryset.order_by('-pub_date', '-id')
+        else:
+            queryset = queryset.order_by('pub_date', 'id')
+        if position is not None:
+            pub_date, pk = position
+            lookup = 'lt' if self.cursor_descending else 'gt'
+            queryset = queryset.filter(
+                Q(**{f'pub_date__{lookup}': pub_date})
+                | Q(pub_date=pub_date, **{f'id__{lookup}': pk})
+            )
+        rows = list(queryset[:page_size + 1])
+        self.has_next = len(rows) > page_size
+        self.rows = rows[:page_size]
+        return self.rows
+
+    def encode_cursor(self, recipe) -> str:
+        position = f'{recipe.pub_date.isoformat()}|{recipe.id}'
+        return base64.urlsafe_b64encode(position.encode()).decode()
+
+    def decode_cursor(self, cursor: str):
+        """
+        :return: (pub_date, id) or None for the first page
+        """
+        if not cursor:
+            return None
+        try:
+            pub_date, pk = (
+                base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+            )
+            pub_date = parse_datetime(pub_date)
+            pk = int(pk)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if pub_date is None:
+            raise NotFound(self.invalid_cursor_message)
+        return pub_date, pk
+
+    def get_next_link(self):
+        if self.mode == 'page':
+            return super().get_next_link()
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        if self.mode == 'cursor':
+            return replace_query_param(
+                url, self.cursor_query_param, self.encode_cursor(self.rows[-1])
+            )
+        return replace_query_param(
+            url, self.page_query_param, self.page_number + 1
+        )
+
+    def get_previous_link(self):
+        if self.mode == 'page':
+            return super().get_previous_link()
+        if self.mode == 'cursor' or self.page_number == 1:
+            return None
+        url = self.request.build_absolute_uri()
+        if self.page_number == 2:
+            return remove_query_param(url, self.page_query_param)
+        return replace_query_param(
+            url, self.page_query_param, self.page_number - 1
+        )
+
+    def get_paginated_response(self, data):
+        if self.mode == 'page':
+            return super().get_paginated_response(data)
+        return Response(OrderedDict([
+            ('count', None),
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data)
+        ]))
+
+
+class FeedPagination(RecipePagination):
+    """
+    keyset pagination only, the newest recipes first
+    """
+    cursor_descending = True
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.count = None
+        self.mode = 'cursor'
+        return self.paginate_by_cursor(queryset, request)
@@ -0,0 +1,67 @@
+import json
+
+from django.conf import settings
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from rest_framework.exceptions import ParseError, ValidationError
+from rest_framework.parsers import DataAndFiles, MultiPartParser
+
+
+def get_image_too_big_message() -> str:
+    return ('Размер изображения больше '
+            f'{settings.RECIPE_IMAGE_MAX_SIZE / (1024 * 1024):g} МБ.')
+
+
+class LimitedTemporaryFileUploadHandler(TemporaryFileUploadHandler):
+    """
+    Streams uploaded files to temporary files, the upload is stopped
+    as soon as a file or the whole request is bigger than allowed.
+    """
+
+    def handle_raw_input(self, input_data, META, content_length, boundary,
+                         encoding=None):
+        # room for the other fields of the form
+        max_length = (settings.RECIPE_IMAGE_MAX_SIZE
+                      + settings.DATA_UPLOAD_MAX_MEMORY_SIZE)
+        if content_length > max_length:
+            raise ValidationError({'image': [get_image_too_big_message()]})
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > settings.RECIPE_IMAGE_MAX_SIZE:
+            self.file.close()
+            raise ValidationError({'image': [get_image_too_big_message()]})
+        return super().receive_data_chunk(raw_data, start)
+
+
+class UploadedFiles(dict):
+    """
+    Files of request with one file per field. request.data is updated
+    by files, with MultiValueDict its values would become lists.
+    lists() is used by HttpRequest.close to close temporary files.
+    """
+
+    def lists(self):
+        return ((key, [file]) for key, file in self.items())
+
+
+class MultiPartJSONParser(MultiPartParser):
+    """
+    multipart/form-data with files, other fields are plain form fields
+    or json object in "data" field:
+    data={"name": ..., "tags": [...], "ingredients": [...]}, image=<file>
+    """
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        request = parser_context['request']
+        request._request.upload_handlers = [
+            LimitedTemporaryFileUploadHandler(request._request)
+        ]
+        data_and_files = super().parse(stream, media_type, parser_context)
+        if 'data' not in data_and_files.data:
+            return data_and_files
+        try:
+            data = json.loads(data_and_files.data['data'])
+        except ValueError as exc:
+            raise ParseError(f'JSON parse error in "data" - {exc}')
+        if not isinstance(data, dict):
+            raise ParseError('Field "data" must be JSON object.')
+        return DataAndFiles(data, UploadedFiles(data_and_files.files.dict()))
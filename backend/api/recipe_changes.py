@@ -0,0 +1,145 @@
+import threading
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+from django.db.models import F
+
+from .models import (Cart, Favorite, IngredientQuantity, Recipe,
+                     ShoppingListItem)
+
+
+def change_counter(queryset, field: str, delta: int):
+    if delta < 0:
+        # counter can't be negative, drift is fixed by reconcile_counters
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    queryset.update(**{field: F(field) + delta})
+
+
+class RecipeChanges(threading.local):
+    """
+    Side effects of changed favorites, carts and ingredients of recipes:
+    counters of recipes and stored shopping lists. The changes are added
+    by receivers (see signals) or by code which writes without signals
+    (bulk_create, bulk_update).
+
+    Outside of batch() they are applied at once. Inside it they are
+    collected and applied together at the end of the block, e.g. for
+    queryset delete, which sends post_delete for every row. The block
+    must be inside of the transaction which makes the changes.
+    """
+    counter_fields = {Favorite: 'favorites_count', Cart: 'carts_count'}
+
+    def __init__(self):
+        self.depth = 0
+        self.clear()
+
+    def clear(self):
+        # {(counter field, recipe id): delta}
+        self.counters = Counter()
+        # {user id: ids of recipes added to or removed from cart}
+        self.carts = defaultdict(set)
+        # {recipe id: ids of ingredients added, changed or removed}
+        self.ingredients = defaultdict(set)
+
+    @contextmanager
+    def batch(self):
+        self.depth += 1
+        try:
+            yield
+        except BaseException:
+            if self.depth == 1:
+                # the transaction is rolled back
+                self.clear()
+            raise
+        finally:
+            self.depth -= 1
+        self.apply()
+
+    def link_changed(self, model: Cart or Favorite, user_id: int,
+                     recipe_ids, delta: int):
+        """
+        :param delta: 1 for created links, -1 for deleted ones
+        """
+        field = self.counter_fields[model]
+        for recipe_id in recipe_ids:
+            self.counters[field, recipe_id] += delta
+        if model is Cart:
+            self.carts[user_id].update(recipe_ids)
+        self.apply()
+
+    def ingredients_changed(self, recipe_id: int, ingredient_ids):
+        if ingredient_ids:
+            self.ingredients[recipe_id].update(ingredient_ids)
+        self.apply()
+
+    def apply(self):
+        if self.depth:
+            return
+        counters, carts, ingredients = (
+            self.counters, self.carts, self.ingredients
+        )
+        self.clear()
+        recipes_by_delta = defaultdict(list)
+        for (field, recipe_id), delta in counters.items():
+            if delta:
+                recipes_by_delta[field, delta].append(recipe_id)
+        for (field, delta), recipe_ids in recipes_by_delta.items():
+            change_counter(
+                Recipe.objects.filter(pk__in=recipe_ids), field, delta
+            )
+        self.refresh_shopping_lists(carts, ingredients)
+
+    def refresh_shopping_lists(self, carts: dict, ingredients: dict):
+        """
+        refresh only changed ingredients, users are grouped by
+        the ingredients to refresh them together
+        :param carts: {user id: ids of recipes added to or removed
+            from cart}
+        :param ingredients: {recipe id: ids of ingredients changed
+            in recipe}
+        """
+        changed = self.get_changed_ingredients(carts)
+        if ingredients:
+            for user_id, recipe_id in Cart.objects.filter(
+                recipe__in=list(ingredients)
+            ).values_list('user', 'recipe'):
+                user_ingredients = changed.setdefault(user_id, set())
+                if user_ingredients is not None:
+                    user_ingredients.update(ingredients[recipe_id])
+        users = defaultdict(list)
+        for user_id, user_ingredients in changed.items():
+            if user_ingredients is not None:
+                user_ingredients = frozenset(user_ingredients)
+            users[user_ingredients].append(user_id)
+        for user_ingredients, user_ids in users.items():
+            ShoppingListItem.objects.refresh(user_ids, user_ingredients)
+
+    def get_changed_ingredients(self, carts: dict) -> dict:
+        """
+        :param carts: {user id: ids of recipes added to or removed
+            from cart}
+        :return: {user id: ids of ingredients of the recipes, None for
+            all ingredients}
+        """
+        if not carts:
+            return {}
+        recipe_ingredients = defaultdict(set)
+        for recipe_id, ingredient_id in IngredientQuantity.objects.filter(
+            recipe__in=set().union(*carts.values())
+        ).values_list('recipe', 'ingredient'):
+            recipe_ingredients[recipe_id].add(ingredient_id)
+        changed = {}
+        for user_id, recipe_ids in carts.items():
+            if all(recipe_id in recipe_ingredients
+                   for recipe_id in recipe_ids):
+                changed[user_id] = set().union(*(
+                    recipe_ingredients[recipe_id] for recipe_id in recipe_ids
+                ))
+            else:
+                # ingredients of deleted recipe are deleted by cascade,
+                # the whole list is recalculated
+                changed[user_id] = None
+        return changed
+
+
+recipe_changes = RecipeChanges()
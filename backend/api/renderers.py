@@ -0,0 +1,35 @@
+from rest_framework.exceptions import NotAcceptable
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.renderers import JSONRenderer
+
+
+class ShoppingListCSVRenderer(JSONRenderer):
+    """
+    Renderers of shopping list file formats. The file is written
+    by the view itself, error responses are rendered as json.
+    """
+    media_type = 'text/csv'
+    format = 'csv'
+
+
+class ShoppingListTextRenderer(ShoppingListCSVRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+
+
+class ShoppingListPDFRenderer(ShoppingListCSVRenderer):
+    media_type = 'application/pdf'
+    format = 'pdf'
+
+
+class ShoppingListContentNegotiation(DefaultContentNegotiation):
+    """
+    Accept header without any of shopping list formats
+    (e.g. application/json) gets the first one, csv
+    """
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        try:
+            return super().select_renderer(request, renderers, format_suffix)
+        except NotAcceptable:
+            return renderers[0], renderers[0].media_type
@@ -1,16 +1,51 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.shortcuts import get_object_or_404
+from django.core.files.uploadedfile import UploadedFile
+from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
+from django.http import Http404
 from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
 from rest_framework.fields import CurrentUserDefault
 
 from users.models import Subscribe  # noqa
+from .images import get_derivative_urls
+from .ingredient_index import ingredient_index
+from .parsers import get_image_too_big_message
 from .models import (Cart, Favorite, IngredientDescription, IngredientQuantity,
                      Recipe, Tag)
+from .recipe_changes import recipe_changes
 
 User = get_user_model()
 
 
+class ImageDerivativesField(serializers.Field):
+    """
+    urls of resized copies of recipe image: {size: {format: url}},
+    None until the copies are made (the frontend shows the original)
+    """
+
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        kwargs['source'] = '*'
+        super().__init__(**kwargs)
+
+    def to_representation(self, recipe):
+        if not recipe.image or not recipe.image_derivatives_ready:
+            return None
+        urls = get_derivative_urls(recipe.image.name)
+        request = self.context.get('request', None)
+        if request is None:
+            return urls
+        return {
+            size: {
+                image_format: request.build_absolute_uri(url)
+                for image_format, url in formats.items()
+            }
+            for size, formats in urls.items()
+        }
+
+
 class AuthorSerializer(serializers.ModelSerializer):
     is_subscribed = serializers.SerializerMethodField(read_only=True)
 
@@ -20,6 +55,9 @@ class AuthorSerializer(serializers.ModelSerializer):
         model = User
 
     def get_is_subscribed(self, obj) -> bool:
+        # annotated by CustomUserManager.with_is_subscribed
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         subscribe = Subscribe.objects.filter(
             user=self.context['request'].user.id,
             author=obj,
@@ -55,13 +93,42 @@ class IngredientRecipeSerializer(serializers.HyperlinkedModelSerializer):
         fields = ('id', 'amount', 'name', 'measurement_unit',)
 
 
+class RecipeImageField(Base64ImageField):
+    """
+    image as base64 string (json) or uploaded file (multipart/form-data),
+    the size is checked before the image is decoded
+    """
+
+    def to_internal_value(self, data):
+        if isinstance(data, str):
+            # length of decoded data is 3/4 of base64 one
+            if len(data) // 4 * 3 > settings.RECIPE_IMAGE_MAX_SIZE:
+                raise serializers.ValidationError(
+                    get_image_too_big_message()
+                )
+            return super().to_internal_value(data)
+        if isinstance(data, UploadedFile):
+            if data.size > settings.RECIPE_IMAGE_MAX_SIZE:
+                raise serializers.ValidationError(
+                    get_image_too_big_message()
+                )
+            # skip base64 decoding of Base64ImageField
+            image = serializers.ImageField.to_internal_value(self, data)
+            image.name = '{}.{}'.format(
+                self.get_file_name(None), image.image.format.lower()
+            )
+            return image
+        return super().to_internal_value(data)
+
+
 class RecipeCreateSerializer(serializers.ModelSerializer):
     tags = serializers.PrimaryKeyRelatedField(
         queryset=Tag.objects.all(), many=True)
     ingredients = IngredientRecipeSerializer(
         source='ingredientquantity_set', many=True, required=True
     )
-    image = Base64ImageField()
+    image = RecipeImageField()
+    images = ImageDerivativesField()
     author = serializers.SlugRelatedField(
         slug_field='username',
         read_only=False,
@@ -72,9 +139,10 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
 
     class Meta:
         fields = ('id', 'tags', 'author', 'ingredients',
-                  'name', 'image', 'text', 'cooking_time',)
+                  'name', 'image', 'images', 'text', 'cooking_time',)
         model = Recipe
 
+    @transaction.atomic
     def create(self, validated_data):
         tags_list = validated_data.pop('tags')
         ingredients_list = validated_data.pop('ingredientquantity_set')
@@ -87,55 +155,119 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         )
         # link tags
         new_recipe.tags.set(tags_list)
-        new_recipe.save()
         # link ingredients
         new_recipe = self.add_ingredients(new_recipe, ingredients_list)
 
         return new_recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
-        tags_list = validated_data.pop('tags')
-        ingredients_list = validated_data.get('ingredientquantity_set', )
-        instance.name = validated_data.get('name', instance.name)
-        instance.image = validated_data.get('image', instance.image)
-        # can be empty
-        instance.text = validated_data.pop('text', instance.text)
-        instance.cooking_time = validated_data.pop(
-            'cooking_time', instance.cooking_time)
-        instance.save()
-        # link tags
-        instance.tags.clear()
-        instance.tags.set(tags_list)
-        instance.save()
+        tags_list = validated_data.pop('tags', None)
+        ingredients_list = validated_data.pop('ingredientquantity_set', None)
+        update_fields = [
+            field for field in ('name', 'image', 'text', 'cooking_time')
+            if field in validated_data
+        ]
+        for field in update_fields:
+            setattr(instance, field, validated_data[field])
+        # updated_at is changed by any update, it is used in ETag
+        instance.save(update_fields=update_fields + ['updated_at'])
+        # link tags, set() touches only added and removed tags
+        if tags_list is not None:
+            instance.tags.set(tags_list)
         # link ingredients
-        instance = self.add_ingredients(instance, ingredients_list, True)
-        instance.save()
+        if ingredients_list is not None:
+            instance = self.update_ingredients(instance, ingredients_list)
         return instance
 
-    def add_ingredients(self, recipe, ingredients: list or tuple,
-                        clear_ingredients: bool = False):
-        if clear_ingredients:
-            recipe.ingredients.clear()
-
-        recipe.save()
-
+    def get_ingredient_amounts(self, ingredients: list or tuple) -> dict:
+        """
+        merge duplicated ingredients (amounts are summed) and check
+        that all of them exist
+        :param ingredients: validated ingredients of recipe
+        :return: {IngredientDescription: amount}
+        """
+        amounts = {}
         for ingredient in ingredients:
-            ingredient_description = get_object_or_404(
-                IngredientDescription, id=ingredient['ingredient']['id']
+            ingredient_id = ingredient['ingredient']['id']
+            amounts[ingredient_id] = (
+                amounts.get(ingredient_id, 0) + abs(ingredient['amount'])
             )
-            ingredient_quantity, created = (
-                IngredientQuantity.objects.get_or_create(
-                    ingredient=ingredient_description,
-                    defaults={'amount': abs(ingredient['amount'])},
-                    recipe=recipe,
-                )
+        ingredient_descriptions = IngredientDescription.objects.in_bulk(
+            list(amounts)
+        )
+        if len(ingredient_descriptions) != len(amounts):
+            raise Http404('Ингредиент не найден.')
+        return {
+            ingredient_descriptions[ingredient_id]: amount
+            for ingredient_id, amount in amounts.items()
+        }
+
+    def add_ingredients(self, recipe, ingredients: list or tuple):
+        amounts = self.get_ingredient_amounts(ingredients)
+        IngredientQuantity.objects.bulk_create(
+            IngredientQuantity(
+                recipe=recipe,
+                ingredient=ingredient,
+                amount=amount,
             )
-            if not created:
-                ingredient_quantity.amount += abs(ingredient['amount'])
-                ingredient_quantity.save()
-        recipe.save()
+            for ingredient, amount in amounts.items()
+        )
+        # new recipe isn't in carts, shopping lists are not changed
+        ingredient_index.invalidate_on_commit()
+        return recipe
+
+    def update_ingredients(self, recipe, ingredients: list or tuple):
+        """
+        write only the difference between existing and new ingredients
+        """
+        amounts = self.get_ingredient_amounts(ingredients)
+        existing = {
+            quantity.ingredient_id: quantity
+            for quantity in IngredientQuantity.objects.filter(recipe=recipe)
+        }
+        to_create = []
+        to_update = []
+        for ingredient, amount in amounts.items():
+            quantity = existing.pop(ingredient.pk, None)
+            if quantity is None:
+                to_create.append(IngredientQuantity(
+                    recipe=recipe, ingredient=ingredient, amount=amount
+                ))
+            elif quantity.amount != amount:
+                quantity.amount = amount
+                to_update.append(quantity)
+        # shopping lists of all changes are refreshed once
+        with recipe_changes.batch():
+            # ingredients left in existing are removed from recipe,
+            # they are handled by post_delete, see signals
+            if existing:
+                IngredientQuantity.objects.filter(
+                    pk__in=[quantity.pk for quantity in existing.values()]
+                ).delete()
+            if to_update:
+                IngredientQuantity.objects.bulk_update(to_update, ['amount'])
+            if to_create:
+                IngredientQuantity.objects.bulk_create(to_create)
+                ingredient_index.invalidate_on_commit()
+            # bulk methods don't send signals
+            recipe_changes.ingredients_changed(recipe.pk, [
+                quantity.ingredient_id for quantity in to_update + to_create
+            ])
         return recipe
 
+    def to_representation(self, instance):
+        prefetch_related_objects(
+            [instance],
+            Prefetch(
+                'ingredientquantity_set',
+                queryset=(
+                    IngredientQuantity.objects.select_related('ingredient')
+                )
+            ),
+        )
+        return super().to_representation(instance)
+
     def validate_cooking_time(self, value):
         if value < 0:
             raise serializers.ValidationError(
@@ -173,6 +305,7 @@ class RecipeSerializer(serializers.ModelSerializer):
         source='ingredientquantity_set', many=True
     )
     image = Base64ImageField()
+    images = ImageDerivativesField()
     author = AuthorSerializer(default=CurrentUserDefault())
     tags = TagSerializer(many=True)
     is_favorited = serializers.SerializerMethodField(read_only=True)
@@ -181,10 +314,13 @@ class RecipeSerializer(serializers.ModelSerializer):
     class Meta:
         fields = ('id', 'tags', 'author', 'ingredients',
                   'is_favorited', 'is_in_shopping_cart', 'name', 'image',
-                  'text', 'cooking_time',)
+                  'images', 'text', 'cooking_time',)
         model = Recipe
 
     def get_is_favorited(self, obj):
+        # annotated by RecipeViewSet.get_queryset
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         is_favorited = Favorite.objects.filter(
             user=self.context['request'].user.id,
             recipe=obj.id,
@@ -192,6 +328,8 @@ class RecipeSerializer(serializers.ModelSerializer):
         return is_favorited
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         is_in_shopping_cart = Cart.objects.filter(
             user=self.context['request'].user.id,
             recipe=obj.id,
@@ -199,8 +337,37 @@ class RecipeSerializer(serializers.ModelSerializer):
         return is_in_shopping_cart
 
 
+class RecipeByIngredientsSerializer(RecipeSerializer):
+    # annotated by RecipeViewSet.by_ingredients
+    ingredients_matched = serializers.IntegerField(read_only=True)
+    ingredients_missing = serializers.IntegerField(read_only=True)
+
+    class Meta(RecipeSerializer.Meta):
+        fields = RecipeSerializer.Meta.fields + (
+            'ingredients_matched', 'ingredients_missing',
+        )
+
+
 class RecipeLinkedModelsSerializer(serializers.ModelSerializer):
+    images = ImageDerivativesField()
+
     class Meta:
-        fields = ('id', 'name', 'image', 'cooking_time',)
+        fields = ('id', 'name', 'image', 'images', 'cooking_time',)
         model = Recipe
         ordering = ['id']
+
+
+class BulkIdsSerializer(serializers.Serializer):  # noqa
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=100,
+    )
+
+
+class IngredientIdsSerializer(serializers.Serializer):  # noqa
+    ingredients = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=50,
+    )
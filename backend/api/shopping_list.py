@@ -0,0 +1,94 @@
+import csv
+import itertools
+import os
+import tempfile
+
+from django.conf import settings
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+
+PDF_FONT_NAME = 'ShoppingListFont'
+PDF_FONT_SIZE = 12
+PDF_MARGIN = 50
+PDF_LINE_HEIGHT = 18
+
+
+class Echo:
+    """
+    file-like object which returns written value instead of storing it
+    """
+    def write(self, value):
+        return value
+
+
+def csv_rows(ingredients):
+    writer = csv.writer(Echo())
+    for ing in ingredients:
+        yield writer.writerow(
+            [str(ing['ingredient__name']),
+             str(ing['amount']),
+             str(ing['ingredient__measurement_unit'])]
+        )
+
+
+def text_rows(ingredients):
+    for ing in ingredients:
+        yield (f"{ing['ingredient__name']} "
+               f"({ing['ingredient__measurement_unit']}) — "
+               f"{ing['amount']}\n")
+
+
+def get_pdf_font() -> str:
+    """
+    default pdf fonts have no cyrillic, so TTF font from settings is used
+    if it exists
+    """
+    if PDF_FONT_NAME in pdfmetrics.getRegisteredFontNames():
+        return PDF_FONT_NAME
+    if os.path.exists(settings.SHOPPING_LIST_PDF_FONT):
+        pdfmetrics.registerFont(
+            TTFont(PDF_FONT_NAME, settings.SHOPPING_LIST_PDF_FONT)
+        )
+        return PDF_FONT_NAME
+    return 'Helvetica'
+
+
+def pdf_file(ingredients):
+    """
+    draw shopping list page by page into temporary file.
+    reportlab keeps all pages in memory until the end, so only first
+    SHOPPING_LIST_PDF_MAX_ROWS rows are drawn, the last line then tells
+    how many rows are left out (the full list is in csv and txt)
+    :return: file opened at the beginning
+    """
+    file = tempfile.SpooledTemporaryFile(
+        max_size=settings.SHOPPING_LIST_PDF_MEMORY_SIZE
+    )
+    font = get_pdf_font()
+    width, height = A4
+    pdf = canvas.Canvas(file, pagesize=A4)
+    pdf.setTitle('Список покупок')
+    pdf.setFont(font, PDF_FONT_SIZE)
+    y = height - PDF_MARGIN
+
+    def draw_line(line):
+        nonlocal y
+        if y < PDF_MARGIN:
+            pdf.showPage()
+            pdf.setFont(font, PDF_FONT_SIZE)
+            y = height - PDF_MARGIN
+        pdf.drawString(PDF_MARGIN, y, line)
+        y -= PDF_LINE_HEIGHT
+
+    rows = text_rows(ingredients)
+    for row in itertools.islice(rows, settings.SHOPPING_LIST_PDF_MAX_ROWS):
+        draw_line(row.rstrip('\n'))
+    left_out = sum(1 for _ in rows)
+    if left_out:
+        draw_line(f'... и еще позиций: {left_out} '
+                  f'(полный список - в формате csv или txt)')
+    pdf.save()
+    file.seek(0)
+    return file
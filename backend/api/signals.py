@@ -0,0 +1,132 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .catalogues import ingredients_catalogue, tags_catalogue
+from .images import has_derivatives, make_derivatives, release_image
+from .ingredient_index import ingredient_index
+from .models import (Cart, Favorite, IngredientDescription, IngredientQuantity,
+                     Recipe, Tag, User)
+from .recipe_changes import change_counter, recipe_changes
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def invalidate_tags_catalogue(sender, **kwargs):
+    # after commit, otherwise other workers can cache old rows
+    transaction.on_commit(tags_catalogue.invalidate)
+
+
+@receiver(post_save, sender=IngredientDescription)
+@receiver(post_delete, sender=IngredientDescription)
+def invalidate_ingredients_catalogue(sender, **kwargs):
+    transaction.on_commit(ingredients_catalogue.invalidate)
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=Cart)
+def link_created(sender, instance, created, **kwargs):
+    if created:
+        recipe_changes.link_changed(
+            sender, instance.user_id, [instance.recipe_id], 1
+        )
+
+
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=Cart)
+def link_deleted(sender, instance, **kwargs):
+    recipe_changes.link_changed(
+        sender, instance.user_id, [instance.recipe_id], -1
+    )
+
+
+@receiver(post_save, sender=Recipe)
+def increase_recipes_count(sender, instance, created, **kwargs):
+    if created:
+        change_counter(
+            User.objects.filter(pk=instance.author_id), 'recipes_count', 1
+        )
+
+
+@receiver(post_delete, sender=Recipe)
+def decrease_recipes_count(sender, instance, **kwargs):
+    change_counter(
+        User.objects.filter(pk=instance.author_id), 'recipes_count', -1
+    )
+
+
+@receiver(pre_save, sender=Recipe)
+def remember_replaced_image(sender, instance, update_fields, **kwargs):
+    if instance.pk is None:
+        return
+    if update_fields is not None and 'image' not in update_fields:
+        return
+    instance._replaced_image = Recipe.objects.filter(
+        pk=instance.pk
+    ).values_list('image', flat=True).first()
+
+
+@receiver(post_save, sender=Recipe)
+def process_recipe_image(sender, instance, created, **kwargs):
+    replaced = instance.__dict__.pop('_replaced_image', None)
+    if not created and replaced is None:
+        return
+    image = instance.image
+    if image.name == replaced:
+        # the same content, derivatives are made already
+        return
+    if image:
+        # copies of equal image uploaded before are served to other
+        # recipes, they are not rewritten
+        ready = has_derivatives(image.name)
+        if instance.image_derivatives_ready != ready:
+            instance.image_derivatives_ready = ready
+            Recipe.objects.filter(pk=instance.pk).update(
+                image_derivatives_ready=ready
+            )
+        if not ready:
+            transaction.on_commit(lambda: make_derivatives(image.name))
+    if replaced:
+        transaction.on_commit(lambda: release_image(replaced))
+
+
+@receiver(post_delete, sender=Recipe)
+def release_recipe_image(sender, instance, **kwargs):
+    image_name = instance.image.name
+    transaction.on_commit(lambda: release_image(image_name))
+
+
+@receiver(pre_save, sender=IngredientQuantity)
+def remember_replaced_ingredient(sender, instance, **kwargs):
+    if instance.pk is None:
+        return
+    instance._replaced_ingredient = IngredientQuantity.objects.filter(
+        pk=instance.pk
+    ).values_list('recipe', 'ingredient').first()
+
+
+@receiver(post_save, sender=IngredientQuantity)
+def ingredient_saved(sender, instance, **kwargs):
+    # admin can move the row to another recipe or ingredient
+    replaced = instance.__dict__.pop('_replaced_ingredient', None)
+    if replaced not in (None, (instance.recipe_id, instance.ingredient_id)):
+        recipe_id, ingredient_id = replaced
+        recipe_changes.ingredients_changed(recipe_id, [ingredient_id])
+    recipe_changes.ingredients_changed(
+        instance.recipe_id, [instance.ingredient_id]
+    )
+
+
+@receiver(post_delete, sender=IngredientQuantity)
+def ingredient_deleted(sender, instance, **kwargs):
+    recipe_changes.ingredients_changed(
+        instance.recipe_id, [instance.ingredient_id]
+    )
+
+
+@receiver(post_save, sender=IngredientQuantity)
+@receiver(post_delete, sender=IngredientQuantity)
+def invalidate_ingredient_index(sender, **kwargs):
+    # deleted recipes cascade here, ingredients created by bulk_create
+    # are handled by RecipeCreateSerializer
+    ingredient_index.invalidate_on_commit()
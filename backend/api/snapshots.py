@@ -0,0 +1,58 @@
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+class VersionedSnapshot:
+    """
+    Data built from database and kept in process memory.
+
+    The snapshot is rebuilt when the version stored in django cache
+    changes, the version is replaced on every change of the data
+    (see signals). With several workers the cache backend must be shared
+    between them. Besides, the snapshot lives at most CATALOGUE_TIMEOUT
+    seconds, so a lost invalidation (e.g. not shared cache) is not kept
+    forever.
+    """
+    version_key = None
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshot = None
+
+    def get_version(self) -> str:
+        version = cache.get(self.version_key)
+        if version is None:
+            cache.add(self.version_key, uuid.uuid4().hex, timeout=None)
+            version = cache.get(self.version_key)
+        return version
+
+    def invalidate(self):
+        cache.set(self.version_key, uuid.uuid4().hex, timeout=None)
+
+    def is_actual(self, snapshot, version) -> bool:
+        return (
+            snapshot is not None
+            and snapshot[0] == version
+            and time.monotonic() < snapshot[1]
+        )
+
+    def get_snapshot(self):
+        """
+        :return: (version, expires, *data from build_data)
+        """
+        version = self.get_version()
+        snapshot = self._snapshot
+        if self.is_actual(snapshot, version):
+            return snapshot
+        with self._lock:
+            if not self.is_actual(self._snapshot, version):
+                expires = time.monotonic() + settings.CATALOGUE_TIMEOUT
+                self._snapshot = (version, expires, *self.build_data())
+            return self._snapshot
+
+    def build_data(self) -> tuple:
+        raise NotImplementedError
@@ -0,0 +1,55 @@
+import hashlib
+import posixpath
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.db import connection
+from django.utils.deconstruct import deconstructible
+
+
+def lock_file_name(name: str):
+    """
+    lock file name till the end of current transaction, so a shared file
+    is not deleted between the check that it exists and the commit of
+    the record which refers to it (see api.images.release_image).
+    Advisory locks are postgres only, outside of transaction it does
+    nothing
+    """
+    if connection.vendor != 'postgresql' or not connection.in_atomic_block:
+        return
+    digest = hashlib.sha256(name.encode()).digest()
+    key = int.from_bytes(digest[:8], 'big', signed=True)
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_advisory_xact_lock(%s)', [key])
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Files are named by sha256 of their content, so equal files are
+    written once and shared: upload_to/ab/abcd...ef.png
+
+    Files are never overwritten, deleting of shared files is up to
+    the caller (see api.images.release_image). The name is locked
+    by lock_file_name before the check that the file exists.
+    """
+
+    def get_content_name(self, name: str, content) -> str:
+        sha256 = hashlib.sha256()
+        for chunk in content.chunks():
+            sha256.update(chunk)
+        digest = sha256.hexdigest()
+        directory, file_name = posixpath.split(name)
+        extension = posixpath.splitext(file_name)[1].lower()
+        return posixpath.join(directory, digest[:2], digest + extension)
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.get_content_name(self.generate_filename(name), content)
+        lock_file_name(name)
+        if self.exists(name):
+            return name
+        return super().save(name, content, max_length=max_length)
@@ -0,0 +1,221 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import override_settings
+from rest_framework.test import APITestCase
+
+from users.models import Subscribe  # noqa
+
+from .models import (Cart, Favorite, IngredientDescription,
+                     IngredientQuantity, Recipe, ShoppingListItem, Tag)
+
+User = get_user_model()
+
+LOCMEM_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+}
+
+
+def create_recipes(author, number, tags, ingredients):
+    """
+    recipes with all given tags and ingredients, images are not written
+    """
+    recipes = []
+    for i in range(number):
+        recipe = Recipe.objects.create(
+            author=author,
+            name=f'Рецепт {i}',
+            image=f'recipes/images/test_{i}.png',
+            text='Описание',
+            cooking_time=i + 1,
+        )
+        recipe.tags.set(tags)
+        IngredientQuantity.objects.bulk_create(
+            IngredientQuantity(recipe=recipe, ingredient=ingredient,
+                               amount=i + 1)
+            for ingredient in ingredients
+        )
+        recipes.append(recipe)
+    return recipes
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class RecipeListQueriesTest(APITestCase):
+    """
+    number of queries of recipe list doesn't depend on page size
+    """
+    url = '/api/recipes/'
+    page_sizes = (1, 6)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            'author', 'author@example.com', 'password',
+            first_name='Автор', last_name='Рецептов'
+        )
+        cls.reader = User.objects.create_user(
+            'reader', 'reader@example.com', 'password',
+            first_name='Читатель', last_name='Рецептов'
+        )
+        tags = [
+            Tag.objects.create(name=f'Тег {i}', color=f'#00000{i}',
+                               slug=f'tag_{i}')
+            for i in range(3)
+        ]
+        ingredients = [
+            IngredientDescription.objects.create(
+                name=f'Ингредиент {i}', measurement_unit='г'
+            )
+            for i in range(5)
+        ]
+        recipes = create_recipes(cls.author, 6, tags, ingredients)
+        Subscribe.objects.create(user=cls.reader, author=cls.author)
+        Favorite.objects.create(user=cls.reader, recipe=recipes[0])
+        Cart.objects.create(user=cls.reader, recipe=recipes[1])
+
+    def setUp(self):
+        cache.clear()
+        # catalogues of tags and ingredients are built on the first request
+        self.client.get(self.url)
+
+    def assert_list_queries(self, number):
+        for page_size in self.page_sizes:
+            with self.subTest(limit=page_size):
+                with self.assertNumQueries(number):
+                    response = self.client.get(
+                        self.url, {'limit': page_size}
+                    )
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.data['results']), page_size)
+                recipe = response.data['results'][0]
+                self.assertEqual(len(recipe['tags']), 3)
+                self.assertEqual(len(recipe['ingredients']), 5)
+
+    def test_anonymous(self):
+        # count, page of validators, recipes, authors, tags, ingredients
+        self.assert_list_queries(6)
+
+    def test_authenticated(self):
+        self.client.force_authenticate(self.reader)
+        self.assert_list_queries(6)
+        response = self.client.get(self.url, {'limit': 6})
+        flags = {
+            recipe['id']: (recipe['is_favorited'],
+                           recipe['is_in_shopping_cart'],
+                           recipe['author']['is_subscribed'])
+            for recipe in response.data['results']
+        }
+        self.assertEqual(
+            sorted(flags.values()),
+            [(False, False, True)] * 4
+            + [(False, True, True), (True, False, True)]
+        )
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class RecipeConditionalGetTest(APITestCase):
+    """
+    304 only while everything the response depends on is the same
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            'reader', 'reader@example.com', 'password',
+            first_name='Читатель', last_name='Рецептов'
+        )
+        tag = Tag.objects.create(name='Тег', color='#000000', slug='tag')
+        ingredient = IngredientDescription.objects.create(
+            name='Ингредиент', measurement_unit='г'
+        )
+        cls.recipes = create_recipes(cls.user, 3, [tag], [ingredient])
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(self.user)
+
+    def assert_changed(self, url, change):
+        response = self.client.get(url)
+        self.assertNotIn('Last-Modified', response)
+        etag = response['ETag']
+        self.assertEqual(
+            self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304
+        )
+        change()
+        response = self.client.get(
+            url, HTTP_IF_NONE_MATCH=etag,
+            HTTP_IF_MODIFIED_SINCE='Fri, 01 Jan 2100 00:00:00 GMT'
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_favorite(self):
+        recipe = self.recipes[0]
+        self.assert_changed(
+            f'/api/recipes/{recipe.pk}/',
+            lambda: self.client.get(f'/api/recipes/{recipe.pk}/favorite/')
+        )
+
+    def test_deleted_from_page(self):
+        self.assert_changed('/api/recipes/', self.recipes[1].delete)
+
+    def test_derivatives_ready(self):
+        recipe = self.recipes[2]
+        self.assert_changed(
+            f'/api/recipes/{recipe.pk}/',
+            lambda: Recipe.objects.filter(pk=recipe.pk).update(
+                image_derivatives_ready=True
+            )
+        )
+
+
+class ShoppingListTest(APITestCase):
+    """
+    stored shopping list follows ingredients changed by any write path
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            'reader', 'reader@example.com', 'password',
+            first_name='Читатель', last_name='Рецептов'
+        )
+        tag = Tag.objects.create(name='Тег', color='#000000', slug='tag')
+        cls.ingredients = [
+            IngredientDescription.objects.create(
+                name=f'Ингредиент {i}', measurement_unit='г'
+            )
+            for i in range(3)
+        ]
+        cls.recipes = create_recipes(
+            cls.user, 2, [tag], cls.ingredients[:2]
+        )
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+        for recipe in self.recipes:
+            self.client.get(f'/api/recipes/{recipe.pk}/shopping_cart/')
+
+    def assert_list(self, amounts):
+        self.assertEqual(
+            dict(ShoppingListItem.objects.filter(user=self.user)
+                 .values_list('ingredient', 'amount')),
+            {self.ingredients[i].pk: amount for i, amount in amounts.items()}
+        )
+
+    def test_ingredients_saved_directly(self):
+        self.assert_list({0: 3, 1: 3})
+        quantity = IngredientQuantity.objects.get(
+            recipe=self.recipes[0], ingredient=self.ingredients[0]
+        )
+        quantity.ingredient = self.ingredients[2]
+        quantity.save()
+        self.assert_list({0: 2, 1: 3, 2: 1})
+        quantity.delete()
+        self.assert_list({0: 2, 1: 3})
+
+    def test_recipe_removed(self):
+        recipe = self.recipes[0]
+        self.client.delete(f'/api/recipes/{recipe.pk}/shopping_cart/')
+        self.assert_list({0: 2, 1: 2})
+        self.client.get(f'/api/recipes/{recipe.pk}/shopping_cart/')
+        self.client.delete(f'/api/recipes/{recipe.pk}/')
+        self.assert_list({0: 2, 1: 2})
@@ -1,26 +1,43 @@
-import csv
+import hashlib
 
 import django_filters.rest_framework
-from django.db.models import Sum
-from django.http import HttpResponse
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import (BooleanField, Case, Count, Exists, F, OuterRef,
+                              Prefetch, Q, Value, When)
+from django.http import FileResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from rest_framework import permissions, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.generics import ListAPIView, RetrieveAPIView
+from rest_framework.parsers import JSONParser
 from rest_framework.response import Response
 
 from users.models import CustomUser, Subscribe # noqa
+from .catalogues import (CatalogueViewMixin, ingredients_catalogue,
+                         tags_catalogue)
 from .filters import RecipeFilter, CustomIngredientsFilter
+from .ingredient_index import ingredient_index
 from .models import (Cart, Favorite, IngredientDescription, IngredientQuantity,
-                     Recipe, Tag)
-from .paginators import CustomPagination
+                     Recipe, ShoppingListItem, Tag)
+from .mixins import BulkLinkMixin, ConditionalGetMixin
+from .paginators import CustomPagination, FeedPagination, RecipePagination
+from .parsers import MultiPartJSONParser
 from .permissions import IsOwnerOrAcceptedMethods
+from .recipe_changes import recipe_changes
+from .renderers import (ShoppingListContentNegotiation,
+                        ShoppingListCSVRenderer, ShoppingListPDFRenderer,
+                        ShoppingListTextRenderer)
 from .serializers import (IngredientDescriptionSerializer,
+                          IngredientIdsSerializer,
+                          RecipeByIngredientsSerializer,
                           RecipeCreateSerializer, RecipeLinkedModelsSerializer,
                           RecipeSerializer, TagSerializer)
+from .shopping_list import csv_rows, pdf_file, text_rows
 
 
-class TagViewSet(ListAPIView, RetrieveAPIView, viewsets.GenericViewSet):
+class TagViewSet(ConditionalGetMixin, CatalogueViewMixin, ListAPIView,
+                 RetrieveAPIView, viewsets.GenericViewSet):
     """
     http://localhost/api/tags/ [GET]
     http://localhost/api/tags/{id} [GET]
@@ -29,12 +46,15 @@ class TagViewSet(ListAPIView, RetrieveAPIView, viewsets.GenericViewSet):
     serializer_class = TagSerializer
     permission_classes = (permissions.IsAuthenticatedOrReadOnly,)
     pagination_class = None
+    catalogue = tags_catalogue
 
 
-class IngredientViewSet(ListAPIView, RetrieveAPIView, viewsets.GenericViewSet):
+class IngredientViewSet(ConditionalGetMixin, CatalogueViewMixin, ListAPIView,
+                        RetrieveAPIView, viewsets.GenericViewSet):
     """
     http://localhost/api/tags/ [GET]
     url host:port/api/ingredients/{id}/ [GET]
+    url host:port/api/ingredients/autocomplete/ [GET]
 
     Filters:
     - Search filter:
@@ -46,9 +66,46 @@ class IngredientViewSet(ListAPIView, RetrieveAPIView, viewsets.GenericViewSet):
     filter_backends = (django_filters.rest_framework.DjangoFilterBackend,)
     filter_class = CustomIngredientsFilter
     pagination_class = None
+    autocomplete_limit = 10
+    autocomplete_max_limit = 50
+    catalogue = ingredients_catalogue
 
+    def get_list_predicate(self):
+        # same as CustomIngredientsFilter
+        name = self.request.query_params.get('name')
+        if not name:
+            return None
+        name = name.lower()
+        return lambda ingredient: ingredient.name.lower().startswith(name)
 
-class RecipeViewSet(viewsets.ModelViewSet):
+    @action(detail=False)
+    def autocomplete(self, request):
+        """
+        http://localhost/api/ingredients/autocomplete/?name=&limit= [GET]
+        Ingredients containing name, the ones starting with name go first.
+        """
+        name = request.query_params.get('name', '').strip()
+        if not name:
+            return Response([])
+        try:
+            limit = int(request.query_params.get('limit'))
+        except (TypeError, ValueError):
+            limit = self.autocomplete_limit
+        limit = max(1, min(limit, self.autocomplete_max_limit))
+        ingredients = (
+            IngredientDescription.objects.filter(name__icontains=name)
+            .annotate(is_not_prefix=Case(
+                When(name__istartswith=name, then=Value(False)),
+                default=Value(True),
+                output_field=BooleanField(),
+            ))
+            .order_by('is_not_prefix', 'name')[:limit]
+        )
+        serializer = self.get_serializer(ingredients, many=True)
+        return Response(serializer.data)
+
+
+class RecipeViewSet(ConditionalGetMixin, BulkLinkMixin, viewsets.ModelViewSet):
     """
     url host:port/api/ingredients/
     Available methods:
@@ -57,20 +114,113 @@ class RecipeViewSet(viewsets.ModelViewSet):
     http://localhost/api/recipes/{id}/ [GET] - Получение рецепта
     http://localhost/api/recipes/{id}/ [PUT] - обновление рецепта
     http://localhost/api/recipes/{id}/ [DEL] - удаление рецепта
+    http://localhost/api/recipes/feed/ [GET] - рецепты из подписок
+    http://localhost/api/recipes/bulk_favorite/ [POST, DEL] - избранное
+    http://localhost/api/recipes/bulk_shopping_cart/ [POST, DEL] - корзина
+    http://localhost/api/recipes/by_ingredients/ [GET] - из имеющихся
 
     Filters:
-    - tags;
+    - tags (tags_match=all for recipes with all of tags);
     - is_favorited;
     - author;
     - is_in_shopping_cart;
+    - search (full text over name and text, ordered by relevance);
+    - ordering=popular (not with cursor pagination);
+
+    Pagination: page and limit, count=false, cursor (see RecipePagination)
+
+    Create and update accept json with base64 image or multipart/form-data
+    with image file (see MultiPartJSONParser)
     """
-    queryset = Recipe.objects.all()
+    # search vector is used only in database by search filter
+    queryset = Recipe.objects.defer('search_vector')
     serializer_class = RecipeSerializer
     filter_backends = (django_filters.rest_framework.DjangoFilterBackend,)
     filter_class = RecipeFilter
-    pagination_class = CustomPagination
+    pagination_class = RecipePagination
+    parser_classes = (JSONParser, MultiPartJSONParser)
     permission_classes = (permissions.IsAuthenticatedOrReadOnly,
                           IsOwnerOrAcceptedMethods,)
+    conditional_vary_headers = ('Authorization',)
+
+    def get_queryset(self):
+        user = self.request.user
+        queryset = super().get_queryset().prefetch_related(
+            Prefetch(
+                'author',
+                queryset=CustomUser.objects.with_is_subscribed(user)
+            ),
+            Prefetch('tags', queryset=Tag.objects.all()),
+            Prefetch(
+                'ingredientquantity_set',
+                queryset=(
+                    IngredientQuantity.objects.select_related('ingredient')
+                )
+            ),
+        )
+        if user.is_anonymous:
+            return queryset.annotate(
+                is_favorited=Value(False, output_field=BooleanField()),
+                is_in_shopping_cart=Value(False, output_field=BooleanField()),
+            )
+        return queryset.annotate(
+            is_favorited=Exists(
+                Favorite.objects.filter(user=user, recipe=OuterRef('pk'))
+            ),
+            is_in_shopping_cart=Exists(
+                Cart.objects.filter(user=user, recipe=OuterRef('pk'))
+            ),
+        )
+
+    def get_validators_queryset(self):
+        """
+        values which the recipe representation depends on
+        """
+        user = self.request.user
+        queryset = (
+            self.filter_queryset(self.get_queryset()).prefetch_related(None)
+        )
+        fields = ('pk', 'updated_at', 'image_derivatives_ready',
+                  'author__email', 'author__username',
+                  'author__first_name', 'author__last_name',)
+        if user.is_anonymous:
+            return queryset.values_list(*fields)
+        return queryset.annotate(
+            user_favorite=Exists(
+                Favorite.objects.filter(user=user, recipe=OuterRef('pk'))
+            ),
+            user_cart=Exists(
+                Cart.objects.filter(user=user, recipe=OuterRef('pk'))
+            ),
+            user_subscribe=Exists(
+                Subscribe.objects.filter(user=user, author=OuterRef('author'))
+            ),
+        ).values_list(*fields, 'user_favorite', 'user_cart', 'user_subscribe')
+
+    def get_etag(self, rows, count=None) -> str:
+        data = (self.request.user.pk, count, rows,
+                tags_catalogue.get_etag(),
+                ingredients_catalogue.get_etag(),)
+        return hashlib.md5(repr(data).encode()).hexdigest()
+
+    def get_list_etag(self):
+        rows = self.paginate_queryset(self.get_validators_queryset())
+        count = self.paginator.count
+        # the list has the same filters, its page doesn't count again
+        self.paginator.known_count = count
+        return self.get_etag(rows, count)
+
+    def get_retrieve_etag(self):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            rows = list(self.get_validators_queryset().filter(
+                pk=self.kwargs[lookup_url_kwarg]
+            ))
+        except ValueError:
+            return None
+        if not rows:
+            return None
+        return self.get_etag(rows)
 
     def get_serializer_class(self):
         if self.action in ('create', 'update', 'partial_update'):
@@ -86,6 +236,83 @@ class RecipeViewSet(viewsets.ModelViewSet):
             return Response(status=201, data=serializer.data)
         return Response(status=400, data="wrong parameters")
 
+    @action(detail=False, permission_classes=[permissions.IsAuthenticated],
+            pagination_class=FeedPagination)
+    def feed(self, request):
+        """
+        http://localhost/api/recipes/feed/ [GET]
+        Recipes of followed authors, the newest first,
+        pages by cursor from the next link. Filters are the same.
+        """
+        queryset = self.filter_queryset(self.get_queryset()).filter(
+            author__in=Subscribe.objects.filter(
+                user=request.user).values('author')
+        )
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @action(detail=False, pagination_class=CustomPagination)
+    def by_ingredients(self, request):
+        """
+        http://localhost/api/recipes/by_ingredients/?ingredients=1&ingredients=2
+        [GET]
+        Recipes with any of given ingredients, the most matched
+        and then the least missing ingredients first.
+        """
+        serializer = IngredientIdsSerializer(
+            data={'ingredients': request.query_params.getlist('ingredients')}
+        )
+        serializer.is_valid(raise_exception=True)
+        ingredient_ids = set(serializer.validated_data['ingredients'])
+        if settings.RECIPE_INGREDIENT_INDEX_IN_MEMORY:
+            page = self.paginate_ranking(ingredient_index.rank(ingredient_ids))
+        else:
+            page = self.paginate_queryset(
+                self.get_by_ingredients_queryset(ingredient_ids)
+            )
+        serializer = RecipeByIngredientsSerializer(
+            page, many=True, context=self.get_serializer_context()
+        )
+        return self.get_paginated_response(serializer.data)
+
+    def get_by_ingredients_queryset(self, ingredient_ids: set):
+        # candidates are found by ingredient_recipe_idx,
+        # matched and total ingredients are counted in one grouped query
+        recipe_ingredients = IngredientQuantity.objects.filter(
+            ingredient__in=ingredient_ids
+        )
+        return self.get_queryset().filter(
+            pk__in=recipe_ingredients.values('recipe')
+        ).annotate(
+            ingredients_matched=Count(
+                'ingredientquantity',
+                filter=Q(ingredientquantity__ingredient__in=ingredient_ids)
+            ),
+            ingredients_missing=(
+                Count('ingredientquantity') - F('ingredients_matched')
+            ),
+        ).order_by('-ingredients_matched', 'ingredients_missing', '-id')
+
+    def paginate_ranking(self, ranking: list) -> list:
+        """
+        page of recipes ranked by in-memory index
+        :param ranking: [(recipe_id, matched, missing), ...]
+        """
+        page = self.paginate_queryset(ranking)
+        recipes = self.get_queryset().in_bulk(
+            [recipe_id for recipe_id, _, _ in page]
+        )
+        result = []
+        for recipe_id, matched, missing in page:
+            # recipe can be deleted after the index is built
+            if recipe_id in recipes:
+                recipe = recipes[recipe_id]
+                recipe.ingredients_matched = matched
+                recipe.ingredients_missing = missing
+                result.append(recipe)
+        return result
+
     @action(detail=True, permission_classes=[permissions.IsAuthenticated],
             methods=['get', 'delete'])
     def shopping_cart(self, request, pk=None, model_name: str = 'cart'):
@@ -98,6 +325,42 @@ class RecipeViewSet(viewsets.ModelViewSet):
         kwargs = self.do_action_with_model(request, pk, model_name)
         return Response(**kwargs)
 
+    @action(detail=False, permission_classes=[permissions.IsAuthenticated],
+            methods=['post', 'delete'])
+    def bulk_favorite(self, request):
+        """
+        http://localhost/api/recipes/bulk_favorite/ [POST, DELETE]
+        """
+        return self.bulk_link(
+            request, Favorite, 'recipe', Recipe.objects.all(),
+            after_add=lambda added: recipe_changes.link_changed(
+                Favorite, request.user.pk, added, 1
+            )
+        )
+
+    @action(detail=False, permission_classes=[permissions.IsAuthenticated],
+            methods=['post', 'delete'])
+    def bulk_shopping_cart(self, request):
+        """
+        http://localhost/api/recipes/bulk_shopping_cart/ [POST, DELETE]
+        """
+        return self.bulk_link(
+            request, Cart, 'recipe', Recipe.objects.all(),
+            after_add=lambda added: recipe_changes.link_changed(
+                Cart, request.user.pk, added, 1
+            )
+        )
+
+    def bulk_link(self, *args, **kwargs):
+        # post_delete of every deleted link is applied once
+        with transaction.atomic(), recipe_changes.batch():
+            return super().bulk_link(*args, **kwargs)
+
+    def perform_destroy(self, instance):
+        # links deleted by cascade are applied once
+        with transaction.atomic(), recipe_changes.batch():
+            instance.delete()
+
     def do_action_with_model(self, request, pk: int, model_name: str):
         """
         this funtion may actions with some models
@@ -120,55 +383,63 @@ class RecipeViewSet(viewsets.ModelViewSet):
 
     def add_recipe_to_model(self, request, pk, model: Cart or Favorite):
         recipe = get_object_or_404(Recipe, pk=pk)
-        new_model = model.objects.filter(
-            recipe=recipe,
-            user=request.user,
-        )
-        if new_model:
-            return {'status': status.HTTP_400_BAD_REQUEST}
-        model.objects.create(
-            recipe=recipe,
-            user=request.user,
-        )
+        with transaction.atomic():
+            # unique constraint rejects the second insert, even concurrent
+            # one, the savepoint covers only the insert itself
+            try:
+                with transaction.atomic():
+                    model.objects.bulk_create(
+                        [model(recipe=recipe, user=request.user)]
+                    )
+            except IntegrityError:
+                return {'status': status.HTTP_400_BAD_REQUEST}
+            # bulk_create doesn't send post_save
+            recipe_changes.link_changed(model, request.user.pk, [recipe.pk], 1)
         serializer = RecipeLinkedModelsSerializer(recipe)
         return {'data': serializer.data, 'status': status.HTTP_200_OK}
 
     def delete_model_with_recipe(self, request, pk, model: Cart or Favorite):
-        recipe = get_object_or_404(Recipe, pk=pk)
-        model_with_recipe = model.objects.get(
+        deleted, _ = model.objects.filter(
             user=request.user,
-            recipe=recipe
-        )
-        if not model_with_recipe:
-            return status.HTTP_400_BAD_REQUEST
-        model_with_recipe.delete()
-        return {'status': status.HTTP_204_NO_CONTENT}
+            recipe=pk
+        ).delete()
+        if deleted:
+            return {'status': status.HTTP_204_NO_CONTENT}
+        get_object_or_404(Recipe, pk=pk)
+        return {'status': status.HTTP_400_BAD_REQUEST}
 
-    @action(detail=False, permission_classes=[permissions.IsAuthenticated])
+    @action(detail=False, permission_classes=[permissions.IsAuthenticated],
+            renderer_classes=[ShoppingListCSVRenderer,
+                              ShoppingListTextRenderer,
+                              ShoppingListPDFRenderer],
+            content_negotiation_class=ShoppingListContentNegotiation)
     def download_shopping_cart(self, request):
-        user_cart = (
-            Cart.objects.filter(user=request.user)
-                .values_list('recipe', flat=True)
-        )
+        """
+        Formats (?format= or Accept header): csv (default), txt, pdf.
+        pdf has at most SHOPPING_LIST_PDF_MAX_ROWS rows
+        """
+        file_format = request.accepted_renderer.format
         ingredients = (
-            IngredientQuantity.objects.filter(recipe__id__in=user_cart)
-            .values('ingredient__name', 'ingredient__measurement_unit')
-            .annotate(amounts=Sum('amount')).all()
+            ShoppingListItem.objects.filter(user=request.user)
+            .values('ingredient__name', 'ingredient__measurement_unit',
+                    'amount')
+            .iterator(chunk_size=settings.SHOPPING_LIST_CHUNK_SIZE)
         )
+        headers = {
+            'Content-Disposition':
+                f'attachment; filename="Список покупок.{file_format}"'
+        }
+        content_type = request.accepted_renderer.media_type
         # Generate file
-        response = HttpResponse(
-            content_type='text/csv',
-            headers={
-                'Content-Disposition':
-                    'attachment; filename="Список покупок.csv"'
-            },
-        )
-
-        writer = csv.writer(response)
-        for ing in ingredients:
-            writer.writerow(
-                [str(ing['ingredient__name']),
-                 str(ing['amounts']),
-                 str(ing['ingredient__measurement_unit'])]
+        if file_format == 'pdf':
+            return FileResponse(
+                pdf_file(ingredients),
+                content_type=content_type,
+                headers=headers
             )
-        return response
+        rows = csv_rows if file_format == 'csv' else text_rows
+        return StreamingHttpResponse(
+            rows(ingredients),
+            content_type=f'{content_type}; charset=utf-8',
+            headers=headers
+        )
@@ -1,4 +1,5 @@
 import os
+from datetime import datetime, timezone
 from pathlib import Path
 
 import environ
@@ -80,6 +81,18 @@ DATABASES = {
     },
 }
 
+# must be shared between workers and management commands (file cache
+# in one container, memcached or redis for several), it keeps versions
+# of in-process catalogues
+CACHES = {
+    'default': env.cache(
+        'CACHE_URL', default='filecache:///tmp/foodgram_cache'
+    ),
+}
+# in-process catalogues are rebuilt at least this often (seconds),
+# even without invalidation
+CATALOGUE_TIMEOUT = 5 * 60
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -126,7 +139,7 @@ REST_FRAMEWORK = {
         'django_filters.rest_framework.DjangoFilterBackend',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.TokenAuthentication',
+        'users.authentication.CachedTokenAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
@@ -139,6 +152,50 @@ REST_FRAMEWORK = {
     'TEST_REQUEST_DEFAULT_FORMAT': 'json'
 }
 
+# token -> user cache of CachedTokenAuthentication.
+# Alias of django cache shared between workers (logout is seen by all
+# of them at once), LRU in process memory if empty
+TOKEN_CACHE_SIZE = 1024
+TOKEN_CACHE_TIMEOUT = 60  # seconds
+TOKEN_CACHE_ALIAS = env('TOKEN_CACHE_ALIAS', default=None)
+
+# recipe image upload, base64 in json or file in multipart/form-data
+RECIPE_IMAGE_MAX_SIZE = 10 * 1024 * 1024
+
+# card, detail and list copies of recipe images, see api/images.py.
+# size: (width, height, crop), box is 2x of the frontend size, images
+# are cropped to the box or scaled to fit within it keeping proportions
+RECIPE_IMAGE_DERIVATIVES_DIR = 'recipes/derivatives'
+RECIPE_IMAGE_SIZES = {
+    'thumb': (144, 144, True),
+    'card': (726, 480, True),
+    'detail': (960, 960, False),
+}
+
+# recipes by ingredients at hand are ranked by in-memory inverted index
+# instead of database query, see api/ingredient_index.py
+RECIPE_INGREDIENT_INDEX_IN_MEMORY = env.bool(
+    'RECIPE_INGREDIENT_INDEX_IN_MEMORY', default=False
+)
+
+# shopping list export
+SHOPPING_LIST_CHUNK_SIZE = 500
+SHOPPING_LIST_PDF_MEMORY_SIZE = 1024 * 1024
+# pdf is built in memory, longer lists are cut (csv and txt are not)
+SHOPPING_LIST_PDF_MAX_ROWS = 3000
+SHOPPING_LIST_PDF_FONT = env(
+    'SHOPPING_LIST_PDF_FONT',
+    default='/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
+)
+
+# recipe popularity, see update_popularity command.
+# Scores grow from epoch, move it and run the command with --full
+# if they get too big.
+POPULARITY_EPOCH = datetime(2021, 10, 1, tzinfo=timezone.utc)
+POPULARITY_HALF_LIFE = 7 * 24 * 60 * 60  # seconds
+POPULARITY_FAVORITE_WEIGHT = 1.0
+POPULARITY_CART_WEIGHT = 0.5
+
 DJOSER = {
     'SET_PASSWORD_RETYPE': False,
     'LOGIN_FIELD': 'email',
@@ -0,0 +1,102 @@
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.authentication import TokenAuthentication
+
+
+class TokenCache:
+    """
+    Cache of token key -> token with its user, entries live timeout
+    seconds. Entries are removed on token deletion and user change
+    (see signals).
+
+    Without cache_alias it is a bounded LRU in process memory,
+    removal reaches only the current process, so with several workers
+    the timeout is the upper bound of staleness. With cache_alias only
+    the shared cache is used, removal is seen by all workers at once.
+    Tokens are stored pickled, every request gets its own instances.
+    """
+    key_prefix = 'auth_token_'
+
+    def __init__(self, max_size: int, timeout: int, cache_alias=None):
+        """
+        :param cache_alias: optional django cache shared between workers
+        """
+        self.max_size = max_size
+        self.timeout = timeout
+        self.cache_alias = cache_alias
+        self._lock = threading.Lock()
+        # key: (expires, pickled token)
+        self._items = OrderedDict()
+
+    @property
+    def shared_cache(self):
+        return caches[self.cache_alias] if self.cache_alias else None
+
+    def get(self, key: str):
+        """
+        :return: token instance with user or None
+        """
+        if self.shared_cache is not None:
+            data = self.shared_cache.get(self.key_prefix + key)
+            return None if data is None else pickle.loads(data)
+        now = time.monotonic()
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            if item[0] > now:
+                self._items.move_to_end(key)
+                return pickle.loads(item[1])
+            del self._items[key]
+        return None
+
+    def set(self, key: str, token):
+        data = pickle.dumps(token, pickle.HIGHEST_PROTOCOL)
+        if self.shared_cache is not None:
+            self.shared_cache.set(
+                self.key_prefix + key, data, timeout=self.timeout
+            )
+            return
+        self._put(key, data)
+
+    def _put(self, key: str, data: bytes):
+        with self._lock:
+            self._items[key] = (time.monotonic() + self.timeout, data)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._items.pop(key, None)
+        if self.shared_cache is not None:
+            self.shared_cache.delete(self.key_prefix + key)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+token_cache = TokenCache(
+    settings.TOKEN_CACHE_SIZE,
+    settings.TOKEN_CACHE_TIMEOUT,
+    settings.TOKEN_CACHE_ALIAS,
+)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication which looks tokens up in token_cache first.
+    """
+
+    def authenticate_credentials(self, key):
+        token = token_cache.get(key)
+        if token is None:
+            user, token = super().authenticate_credentials(key)
+            token_cache.set(key, token)
+        return token.user, token
@@ -1,4 +1,6 @@
+from django.apps import apps
 from django.contrib.auth.models import BaseUserManager
+from django.db.models import BooleanField, Exists, OuterRef, Value
 
 
 class CustomUserManager(BaseUserManager):
@@ -26,3 +28,20 @@ class CustomUserManager(BaseUserManager):
         user.save()
 
         return user
+
+    def with_is_subscribed(self, user):
+        """
+        queryset of users annotated with is_subscribed flag of given user
+        """
+        if user.is_anonymous:
+            return self.annotate(
+                is_subscribed=Value(False, output_field=BooleanField())
+            )
+        subscribe_model = apps.get_model('users', 'Subscribe')
+        return self.annotate(
+            is_subscribed=Exists(
+                subscribe_model.objects.filter(
+                    user=user, author=OuterRef('pk')
+                )
+            )
+        )
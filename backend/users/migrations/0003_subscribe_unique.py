@@ -0,0 +1,28 @@
+# Generated by Django 3.2.7 on 2026-10-17 01:35
+
+from django.db import migrations, models
+from django.db.models import Min
+
+
+def delete_duplicates(apps, schema_editor):
+    Subscribe = apps.get_model('users', 'Subscribe')
+    first_ids = (
+        Subscribe.objects.values('user', 'author')
+        .annotate(first_id=Min('id')).values('first_id')
+    )
+    Subscribe.objects.exclude(id__in=first_ids).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_customuser_recipes_count'),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='subscribe',
+            constraint=models.UniqueConstraint(fields=('user', 'author'), name='unique_user_author_subscribe'),
+        ),
+    ]
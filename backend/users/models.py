@@ -25,6 +25,8 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
     is_staff = models.BooleanField('Персонал сайта', default=False)
     date_joined = models.DateTimeField(
         'Дата создания пользователя', default=timezone.now)
+    recipes_count = models.PositiveIntegerField(
+        'Количество рецептов', default=0)
 
     REQUIRED_FIELDS = (
         'username', 'password', 'first_name', 'last_name',
@@ -53,6 +55,11 @@ class Subscribe(models.Model):
         ordering = ['pk']
         verbose_name = 'подписка'
         verbose_name_plural = 'подписки'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'], name='unique_user_author_subscribe'
+            )
+        ]
 
     def __str__(self):
         return (f'Follower: {self.user.username} '  # noqa
@@ -50,9 +50,15 @@ class SubscribeListSerializer(serializers.Serializer):  # noqa
     recipes_count = serializers.SerializerMethodField(read_only=True)
 
     def get_recipes_count(self, obj) -> int:
-        return obj.author.recipes.count()
+        return obj.author.recipes_count
 
     def get_recipes(self, obj) -> dict:
+        # loaded by SubscriptionsListSet.add_author_recipes
+        if hasattr(obj, 'author_recipes'):
+            serializer = RecipeLinkedModelsSerializer(
+                instance=obj.author_recipes, many=True
+            )
+            return serializer.data
         recipes_limit = (
             self.context['view'].request.query_params.get('recipes_limit')
             if self.context else None
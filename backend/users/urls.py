@@ -7,7 +7,6 @@ from .views import SubscriptionsListSet, UserSet
 router = DefaultRouter()
 
 router.register(r'^users', UserSet, basename='users')
-router.register(r'^users/(?P<user_id>\d+)', UserSet, basename='users')
 router.register(
     r'^users/subscriptions', SubscriptionsListSet, basename='subscriptions'
 )
@@ -1,21 +1,36 @@
-from django.http.response import JsonResponse
+from collections import defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+from django.http import Http404
 from django.shortcuts import get_object_or_404
 from rest_framework import mixins, permissions, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
 
+from api.mixins import BulkLinkMixin  # noqa
+from api.models import Recipe  # noqa
 from api.paginators import CustomPagination  # noqa
 from api.serializers import AuthorSerializer  # noqa
 from .models import CustomUser, Subscribe
 from .serializers import SubscribeListSerializer, UserCreateSerializer
 
 
-class UserSet(mixins.ListModelMixin,
+class UserSet(BulkLinkMixin,
+              mixins.ListModelMixin,
+              mixins.RetrieveModelMixin,
               mixins.CreateModelMixin,
               viewsets.GenericViewSet):
+    """
+    url http://localhost/api/users/ [GET, POST]
+    url http://localhost/api/users/{id}/ [GET]
+    """
     permission_classes = (permissions.AllowAny,)
     serializer_class = AuthorSerializer
     pagination_class = CustomPagination
+    # users/me/ and other djoser urls are not matched
+    lookup_value_regex = r'\d+'
 
     def get_serializer_class(self):
         if self.action in {'create'}:
@@ -23,25 +38,7 @@ class UserSet(mixins.ListModelMixin,
         return AuthorSerializer
 
     def get_queryset(self):
-        user_id = self.kwargs.get('user_id')
-        if user_id:
-            return get_object_or_404(CustomUser, id=user_id)
-        queryset = CustomUser.objects.all()
-        return queryset
-
-    def list(self, request, *args, **kwargs):
-        queryset = self.filter_queryset(self.get_queryset())
-        if isinstance(queryset, CustomUser):
-            serializer = self.get_serializer(queryset)
-            return JsonResponse(serializer.data)
-
-        page = self.paginate_queryset(queryset)
-        if page is not None:
-            serializer = self.get_serializer(page, many=True)
-            return self.get_paginated_response(serializer.data)
-
-        serializer = self.get_serializer(queryset, many=True)
-        return JsonResponse(serializer.data)
+        return CustomUser.objects.with_is_subscribed(self.request.user)
 
     @action(detail=True, permission_classes=[permissions.IsAuthenticated],
             methods=['delete', 'get'])
@@ -54,30 +51,42 @@ class UserSet(mixins.ListModelMixin,
             kwargs = self.create_subscribe(request, pk)
             return Response(**kwargs)
 
+    @action(detail=False, permission_classes=[permissions.IsAuthenticated],
+            methods=['post', 'delete'])
+    def bulk_subscribe(self, request):
+        """
+        url http://localhost/api/users/bulk_subscribe/ [POST, DELETE]
+        """
+        return self.bulk_link(
+            request, Subscribe, 'author',
+            CustomUser.objects.exclude(pk=request.user.pk)
+        )
+
     def create_subscribe(self, request, author_id: int) -> dict:
         author = get_object_or_404(CustomUser, pk=author_id)
-        subscribe = Subscribe.objects.filter(
-            author=author,
-            user=request.user,
-        )
-        if subscribe or author_id == request.user.pk:
-            return {
-                'data': {'error_400': 'Ошибка подписки'},
-                'status': status.HTTP_400_BAD_REQUEST,
-            }
-        new_subscribe = Subscribe.objects.create(
-            author=author,
-            user=request.user,
-        )
+        error = {
+            'data': {'error_400': 'Ошибка подписки'},
+            'status': status.HTTP_400_BAD_REQUEST,
+        }
+        if author.pk == request.user.pk:
+            return error
+        # unique constraint rejects the second insert, even concurrent one
+        try:
+            with transaction.atomic():
+                new_subscribe = Subscribe.objects.create(
+                    author=author,
+                    user=request.user,
+                )
+        except IntegrityError:
+            return error
         serializer = SubscribeListSerializer(new_subscribe)
         return {'data': serializer.data, 'status': status.HTTP_200_OK}
 
     def delete_subscribe(self, request, pk) -> dict:
-        if pk == request.user.id:
-            return {'status': status.HTTP_400_BAD_REQUEST}
-        subscribe = get_object_or_404(
-            Subscribe, author=pk, user=request.user.id)
-        subscribe.delete()
+        deleted, _ = Subscribe.objects.filter(
+            author=pk, user=request.user.id).delete()
+        if not deleted:
+            raise Http404
         return {'status': status.HTTP_204_NO_CONTENT}
 
 
@@ -90,5 +99,53 @@ class SubscriptionsListSet(viewsets.GenericViewSet, mixins.ListModelMixin):
     pagination_class = CustomPagination
 
     def get_queryset(self):
-        queryset = Subscribe.objects.filter(user=self.request.user)
+        queryset = (
+            Subscribe.objects.filter(user=self.request.user)
+            .select_related('author')
+        )
         return queryset
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        subscribes = page if page is not None else list(queryset)
+        self.add_author_recipes(subscribes)
+        serializer = self.get_serializer(subscribes, many=True)
+        if page is not None:
+            return self.get_paginated_response(serializer.data)
+        return Response(serializer.data)
+
+    def get_recipes_limit(self):
+        try:
+            return int(self.request.query_params['recipes_limit'])
+        except (KeyError, ValueError):
+            return None
+
+    def add_author_recipes(self, subscribes):
+        """
+        load recipes of all authors by one query, not more than
+        recipes_limit per author, and set them to author_recipes
+        """
+        author_ids = {subscribe.author_id for subscribe in subscribes}
+        if not author_ids:
+            return
+        recipes_limit = self.get_recipes_limit()
+        recipes = Recipe.objects.filter(
+            author__in=author_ids).order_by('pub_date', 'id')
+        if recipes_limit is not None:
+            recipes = recipes.order_by().annotate(row_number=Window(
+                expression=RowNumber(),
+                partition_by=F('author'),
+                order_by=(F('pub_date').asc(), F('id').asc()),
+            ))
+            sql, params = recipes.query.sql_with_params()
+            recipes = Recipe.objects.raw(
+                f'SELECT * FROM ({sql}) AS recipes WHERE row_number <= %s '
+                'ORDER BY pub_date, id',
+                (*params, recipes_limit)
+            )
+        author_recipes = defaultdict(list)
+        for recipe in recipes:
+            author_recipes[recipe.author_id].append(recipe)
+        for subscribe in subscribes:
+            subscribe.author_recipes = author_recipes[subscribe.author_id]
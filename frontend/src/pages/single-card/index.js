@@ -42,6 +42,7 @@ const SingleCard = ({ loadItem, updateOrders }) => {
   const {
     author = {},
     image,
+    images,
     tags,
     cooking_time,
     name,
@@ -59,7 +60,10 @@ const SingleCard = ({ loadItem, updateOrders }) => {
         <meta property="og:title" content={name} />
       </MetaTags>
       <div className={styles['single-card']}>
-        <img src={image} alt={name} className={styles["single-card__image"]} />
+        {images ? <picture className={styles["single-card__picture"]}>
+          <source srcSet={images.detail.webp} type="image/webp" />
+          <img src={images.detail.jpeg} alt={name} className={styles["single-card__image"]} />
+        </picture> : <img src={image} alt={name} className={styles["single-card__image"]} />}
         <div className={styles["single-card__info"]}>
           <div className={styles["single-card__header-info"]}>
               <h1 className={styles["single-card__title"]}>{name}</h1>